@@ -1,31 +1,154 @@
 import asyncio
+import contextvars
+import threading
 import time
-import re
-from collections import Counter
-from typing import List, Dict, Set
-from config import logger, SINGLE_LETTER_FREQ_FILE, PAIR_LETTER_FREQ_FILE, OVERALL_LETTER_FREQ_FILE, CLEAN_WORDLIST_FILE, CLEAN_WORDLIST_FILE_E, CLEAN_WORDLIST_FILE_NE, THREADCOUNT
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Optional, Set, Tuple
+from config import logger, round_logger, SINGLE_LETTER_FREQ_FILE, PAIR_LETTER_FREQ_FILE, OVERALL_LETTER_FREQ_FILE, CLEAN_WORDS_FILE, CLEAN_WORD_OFFSETS_FILE, CLEAN_WORD_BITSETS_FILE, CLEAN_WORD_MASKS_FILE, CLEAN_WORD_DELTA_FILE, OPENING_BOOK_FILE, SCORING_MODE, DECISION_CACHE_SIZE, PKL_DIR, SHARED_INDEX, SHARED_INDEX_DIR, LEARNED_INDEX_DIR, WORD_DELTA_FILE, WORD_DELTA_MERGE_SIZE
+from preprocess import normalize_word, build_letter_masks, build_position_bitsets, extend_position_bitsets, save_index_file, save_word_matrix
+from solver import filter_and_count, choose_letter
+import fcntl
 import os
 import pickle
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from numba import njit
+import shutil
 import numpy as np
-import logging
-
-# Suppress Numba debug logs
-numba_logger = logging.getLogger('numba')
-numba_logger.setLevel(logging.WARNING)
-
 
 # Precomputed letter frequencies loaded from pickle files
 single_letter_freq: Dict[str, Dict[str, float]] = {}
 pair_letter_freq: Dict[tuple, Dict[str, float]] = {}
 overall_letter_freq: Dict[str, float] = {}
 
-# Clean wordlist loaded from pickle file
-word_list: List[str] = []
-word_list_e: List[str] = []
-word_list_ne: List[str] = []
+# Clean wordlist memory-mapped from the .npy files written by preprocess.py
+# Words bucketed by length as uint8 matrices of ASCII letters, split into words with and without 'E'
+word_matrix_e: Dict[int, np.ndarray] = {}
+word_matrix_ne: Dict[int, np.ndarray] = {}
+# Letter-presence mask of every word per length bucket, bit k set if the word contains chr(65 + k)
+word_masks_e: Dict[int, np.ndarray] = {}
+word_masks_ne: Dict[int, np.ndarray] = {}
+# Positional letter bitsets per length bucket, shape (length, 26, ceil(words / 8))
+word_bitsets_e: Dict[int, np.ndarray] = {}
+word_bitsets_ne: Dict[int, np.ndarray] = {}
 word_list_mtime: float = 0.0  # Modification time of the word list file
+word_index_base: Optional[float] = None  # index_mtime of the preprocessed index the loaded one is built from
+
+# Words learned during play that are not in the index files yet, and the read position in WORD_DELTA_FILE
+learned_word_count = 0
+word_delta_inode: Optional[int] = None
+word_delta_offset = 0
+merge_thread: Optional[threading.Thread] = None  # Writes the learned words into the index files
+
+# Files of the word index, the offsets file is written last and marks a complete index
+INDEX_FILES = [CLEAN_WORDS_FILE, CLEAN_WORD_MASKS_FILE, CLEAN_WORD_BITSETS_FILE, CLEAN_WORD_OFFSETS_FILE]
+INDEX_LOCK_FILE = '.lock'
+# Modification time of the offsets file of the preprocessed index a merged index in LEARNED_INDEX_DIR was built from
+LEARNED_INDEX_BASE_FILE = 'clean_word_base.npy'
+
+# Opening book entries written by preprocess.py, (word_state, sorted guessed letters) -> next letter
+opening_book: Dict[Tuple[str, str], str] = {}
+
+class CandidateState:
+    """
+    Candidates of the running game and the constraints they were filtered with.
+    The candidate set can only shrink within a game, so every round refines it.
+    """
+    def __init__(self):
+        self.word_state: str = ''
+        self.incorrect_letters: Set[str] = set()
+        self.words: np.ndarray = None  # Length bucket the indices point into
+        self.indices: np.ndarray = None  # Row indices into the length bucket
+        self.letter_frequencies: Dict[str, int] = {}  # Of the stored candidates, for answers past the deadline
+        # Durations in seconds of the solver phases ('filtering', 'counting', 'decision') of the last turn
+        self.phase_times: Dict[str, float] = {}
+        self.generation = 0  # Counts resets, so a late result of the previous game is not stored
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.word_state = ''
+            self.incorrect_letters = set()
+            self.words = None
+            self.indices = None
+            self.letter_frequencies = {}
+
+    def update(self, generation: int, word_state: str, incorrect_letters: Set[str], words: np.ndarray, indices: np.ndarray, letter_frequencies: Dict[str, int]) -> None:
+        """Stores the candidates of a round unless the state was reset since the round started."""
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.word_state = word_state
+            self.incorrect_letters = incorrect_letters
+            self.words = words
+            self.indices = indices
+            self.letter_frequencies = letter_frequencies
+
+    def can_refine(self, word_state: str, incorrect_letters: Set[str], words: np.ndarray) -> bool:
+        """
+        Checks if word_state and incorrect_letters only add constraints to the stored ones and the
+        stored indices point into words. A reloaded index or a bucket with learned words is a new array.
+        """
+        if self.indices is None or words is not self.words or len(self.word_state) != len(word_state):
+            return False
+        if ('E' in self.incorrect_letters) != ('E' in incorrect_letters):
+            return False  # Different bucket
+        if not self.incorrect_letters <= incorrect_letters:
+            return False
+        return all(old == '_' or old == new for old, new in zip(self.word_state, word_state))
+
+# Candidates of the current game when the caller does not keep its own state,
+# reset at the start of every game
+candidate_state = CandidateState()
+
+class DecisionCache:
+    """
+    Bounded LRU cache of decisions keyed by (word_state, sorted guessed letters)
+    with the next letter as value. It is cleared from the solver
+    thread when the word list is reloaded, so every access holds the lock.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple[str, str], value: Optional[str]) -> None:
+        if self.max_size <= 0 or value is None:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)  # Evict the least recently used decision
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def discard_length(self, length: int) -> None:
+        """Removes the decisions for words of a length, after words of that length were added."""
+        with self.lock:
+            for key in [key for key in self.entries if len(key[0]) == length]:
+                del self.entries[key]
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+# Decisions shared by all games, cleared whenever the word list changes
+decision_cache = DecisionCache(DECISION_CACHE_SIZE)
 
 def load_precomputed_frequencies():
     global single_letter_freq, pair_letter_freq, overall_letter_freq
@@ -42,13 +165,80 @@ def load_precomputed_frequencies():
     except Exception as e:
         logger.error(f"Error loading precomputed frequencies: {e}")
 
-def load_clean_wordlist(pickle_file: str = CLEAN_WORDLIST_FILE) -> None:
-    global word_list, word_list_e, word_list_ne, word_list_mtime
+@contextmanager
+def index_lock(index_dir: str, exclusive: bool):
+    """
+    Holds the lock file of a shared index directory, exclusively while publishing.
+    Readers skip locking if nothing was published yet or the volume is read-only.
+    """
+    lock_file = os.path.join(index_dir, INDEX_LOCK_FILE)
+    try:
+        lock = open(lock_file, 'a' if exclusive else 'r')
+    except OSError:
+        if exclusive:
+            raise
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+def publish_shared_index(index_dir: str = SHARED_INDEX_DIR) -> None:
+    """
+    Copies the word index from PKL_DIR to index_dir unless the published one is at least as new.
+    Publishing holds an exclusive lock on the lock file and loading a shared one, and every file
+    is replaced by a rename, so processes that mapped the previous index keep a consistent view.
+    """
+    source_offsets = os.path.join(PKL_DIR, os.path.basename(CLEAN_WORD_OFFSETS_FILE))
+    published_offsets = os.path.join(index_dir, os.path.basename(CLEAN_WORD_OFFSETS_FILE))
+    try:
+        source_mtime = os.path.getmtime(source_offsets)
+    except FileNotFoundError:
+        return  # Nothing to publish, use the index published by another container
+    if os.path.exists(published_offsets) and os.path.getmtime(published_offsets) >= source_mtime:
+        return
+
+    os.makedirs(index_dir, exist_ok=True)
+    with index_lock(index_dir, exclusive=True):
+        if os.path.exists(published_offsets) and os.path.getmtime(published_offsets) >= source_mtime:
+            return  # Published by another process while we waited
+        start_time = time.time()
+        for file in INDEX_FILES:
+            name = os.path.basename(file)
+            temp_file = os.path.join(index_dir, f".{name}.{os.getpid()}")
+            shutil.copy2(os.path.join(PKL_DIR, name), temp_file)
+            os.replace(temp_file, os.path.join(index_dir, name))
+        logger.info(f"Published word index to {index_dir} in {time.time() - start_time:.4f} seconds.")
+
+def load_clean_wordlist(index_dir: Optional[str] = None) -> None:
+    """
+    Memory-maps the word matrix, the letter masks and the positional letter bitsets read-only
+    from index_dir. By default that is the shared index directory with SHARED_INDEX and PKL_DIR
+    otherwise, or LEARNED_INDEX_DIR while its merged index was built from the current one.
+    The per-length buckets are zero-copy views into the mapped files, so processes mapping
+    the same files share their pages.
+    """
+    global word_matrix_e, word_matrix_ne, word_masks_e, word_masks_ne, word_bitsets_e, word_bitsets_ne, word_list_mtime
+    global word_index_base, learned_word_count, word_delta_inode, word_delta_offset
+    if index_dir is None:
+        index_dir = SHARED_INDEX_DIR if SHARED_INDEX else PKL_DIR
+    if SHARED_INDEX and index_dir == SHARED_INDEX_DIR:
+        try:
+            publish_shared_index(index_dir)
+        except Exception as e:
+            logger.error(f"Error publishing shared word index: {e}")
+    if index_dir in (SHARED_INDEX_DIR, PKL_DIR) and index_mtime(LEARNED_INDEX_DIR) is not None \
+            and learned_index_base(LEARNED_INDEX_DIR) == index_mtime(index_dir):
+        index_dir = LEARNED_INDEX_DIR
+    words_file, masks_file, bitsets_file, offsets_file = (os.path.join(index_dir, os.path.basename(file)) for file in INDEX_FILES)
+    delta_file = os.path.join(index_dir, os.path.basename(CLEAN_WORD_DELTA_FILE))
     try:
-        current_mtime = os.path.getmtime(pickle_file)
+        current_mtime = os.path.getmtime(offsets_file)
     except FileNotFoundError:
-        logger.error(f"Clean wordlist file not found at {pickle_file}. Please run preprocess.py first.")
-        word_list = []
+        logger.error(f"Clean wordlist file not found at {offsets_file}. Please run preprocess.py first.")
+        word_matrix_e, word_matrix_ne = {}, {}
+        word_masks_e, word_masks_ne = {}, {}
+        word_bitsets_e, word_bitsets_ne = {}, {}
         word_list_mtime = 0.0
         return
     except Exception as e:
@@ -61,180 +251,303 @@ def load_clean_wordlist(pickle_file: str = CLEAN_WORDLIST_FILE) -> None:
 
     start_time = time.time()  # Start timing
     try:
-        with open(pickle_file, 'rb') as f:
-            word_list = pickle.load(f)
-        with open(CLEAN_WORDLIST_FILE_E, 'rb') as f:
-            word_list_e = pickle.load(f)
-        with open(CLEAN_WORDLIST_FILE_NE, 'rb') as f:
-            word_list_ne = pickle.load(f)
+        # The shared lock keeps a publisher from replacing files halfway through
+        with index_lock(index_dir, exclusive=False) if SHARED_INDEX or index_dir == LEARNED_INDEX_DIR else nullcontext():
+            current_mtime = os.path.getmtime(offsets_file)
+            offsets = np.load(offsets_file)
+            words = np.load(words_file, mmap_mode='r')
+            masks = np.load(masks_file, mmap_mode='r')
+            bitsets = np.load(bitsets_file, mmap_mode='r')
+            delta_position = np.load(delta_file).tolist() if os.path.exists(delta_file) else None
+            base = learned_index_base(index_dir) if index_dir == LEARNED_INDEX_DIR else current_mtime
+        matrices = {0: {}, 1: {}}
+        mask_views = {0: {}, 1: {}}
+        bitset_views = {0: {}, 1: {}}
+        for has_e, length, count, word_start, mask_start, bitset_start in offsets.tolist():
+            nbytes = (count + 7) // 8
+            matrices[has_e][length] = words[word_start:word_start + count * length].reshape(count, length)
+            mask_views[has_e][length] = masks[mask_start:mask_start + count]
+            bitset_views[has_e][length] = bitsets[bitset_start:bitset_start + length * 26 * nbytes].reshape(length, 26, nbytes)
+        word_matrix_e, word_matrix_ne = matrices[1], matrices[0]
+        word_masks_e, word_masks_ne = mask_views[1], mask_views[0]
+        word_bitsets_e, word_bitsets_ne = bitset_views[1], bitset_views[0]
         word_list_mtime = current_mtime
-        logger.info(f"Loaded clean wordlist with {len(word_list)} words in {time.time() - start_time:.4f} seconds.")
+        word_index_base = base
+        decision_cache.clear()  # Cached decisions were made with the previous word list
+        logger.info(f"Loaded clean wordlist with {int(offsets[:, 2].sum())} words in {time.time() - start_time:.4f} seconds.")
     except Exception as e:
         logger.error(f"Error loading clean wordlist: {e}")
-        word_list = []
+        word_matrix_e, word_matrix_ne = {}, {}
+        word_masks_e, word_masks_ne = {}, {}
+        word_bitsets_e, word_bitsets_ne = {}, {}
+        delta_position = None
+
+    # The learned words after those merged into the index are replayed on top of it,
+    # those it already contains are skipped
+    learned_word_count = 0
+    word_delta_inode, word_delta_offset = delta_position if delta_position is not None else (None, 0)
+    load_word_delta()
+
+def index_mtime(index_dir: str) -> Optional[float]:
+    """Returns the modification time of the offsets file in index_dir, None without an index."""
+    try:
+        return os.path.getmtime(os.path.join(index_dir, os.path.basename(CLEAN_WORD_OFFSETS_FILE)))
+    except OSError:
+        return None
 
-# Initialize word list and letter frequencies
-load_clean_wordlist()
-load_precomputed_frequencies()
+def learned_index_base(index_dir: str) -> Optional[float]:
+    """Returns the index_mtime of the preprocessed index a merged index was built from, None without one."""
+    try:
+        return float(np.load(os.path.join(index_dir, LEARNED_INDEX_BASE_FILE))[0])
+    except Exception:
+        return None
 
-def build_regex_pattern(word_state: str) -> re.Pattern:
+def contained_rows(bitsets: Optional[np.ndarray], rows: np.ndarray) -> np.ndarray:
     """
-    Builds a regex pattern from the word_state.
-    '_' is replaced with '.', and known letters are escaped.
-    The pattern is compiled for faster matching.
+    Returns a boolean array marking the rows of a uint8 word matrix that are already in the bucket
+    with these positional letter bitsets: a row is contained if the bitsets of its letters share a bit.
     """
-    # Replace '_' with '.', escape other characters
-    word_state_regex = ''.join(['.' if c == '_' else re.escape(c) for c in word_state.upper()])
-    # Since word length is unknown, allow any number of characters before and after
-    pattern = f"{word_state_regex}"  # Match the entire word
-    regex = re.compile(pattern)
-    return regex
+    if bitsets is None:
+        return np.zeros(len(rows), dtype=np.bool_)
+    positions = np.arange(rows.shape[1])
+    return np.array([np.bitwise_and.reduce(bitsets[positions, row - ord('A')], axis=0).any() for row in rows], dtype=np.bool_)
 
-def filter_word(word: str, regex: re.Pattern, incorrect_letters: Set[str]) -> bool:
+def insert_words(words: List[str]) -> int:
     """
-    Checks if a word matches the regex pattern and doesn't contain any incorrect letters.
+    Adds normalized words to the loaded index and returns the number of words it did not contain.
+    Membership is checked with the positional letter bitsets. The buckets of the new words are
+    replaced by copies with the words appended and the bitsets extended by their rows, so running
+    games filter their next round from scratch. The copies are read-only like the mapped buckets,
+    for which the kernels are compiled. Runs on the solver thread.
     """
-    if not regex.search(word):
-        return False
-    if set(word).intersection(incorrect_letters):
+    global learned_word_count
+    groups: Dict[Tuple[bool, int], List[str]] = {}
+    for word in set(words):
+        groups.setdefault(('E' in word, len(word)), []).append(word)
+
+    added = 0
+    for (has_e, length), group in groups.items():
+        matrices, masks, bitsets = (word_matrix_e, word_masks_e, word_bitsets_e) if has_e else (word_matrix_ne, word_masks_ne, word_bitsets_ne)
+        rows = np.frombuffer(''.join(group).encode('ascii'), dtype=np.uint8).reshape(len(group), length)
+        base = matrices.get(length)
+        rows = rows[~contained_rows(bitsets.get(length), rows)]
+        if len(rows) == 0:
+            continue
+        if base is not None:
+            bucket = np.concatenate([base, rows])
+            bucket_masks = np.concatenate([masks[length], build_letter_masks(rows)])
+            bucket_bitsets = extend_position_bitsets(bitsets[length], len(base), rows)
+        else:
+            bucket = rows.copy()
+            bucket_masks = build_letter_masks(rows)
+            bucket_bitsets = build_position_bitsets(bucket)
+        for array in (bucket, bucket_masks, bucket_bitsets):
+            array.flags.writeable = False
+        matrices[length], masks[length], bitsets[length] = bucket, bucket_masks, bucket_bitsets
+        decision_cache.discard_length(length)  # Decided without the new words
+        added += len(rows)
+    learned_word_count += added
+    return added
+
+def load_word_delta() -> None:
+    """
+    Adds the words appended to WORD_DELTA_FILE since the last read,
+    including those learned by other bots sharing the data directory.
+    """
+    global word_delta_inode, word_delta_offset
+    try:
+        with open(WORD_DELTA_FILE, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != word_delta_inode or stat.st_size < word_delta_offset:
+                word_delta_inode, word_delta_offset = stat.st_ino, 0
+            if stat.st_size == word_delta_offset:
+                return
+            f.seek(word_delta_offset)
+            appended = f.read(stat.st_size - word_delta_offset)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        logger.error(f"Error reading learned words: {e}")
+        return
+
+    complete = appended.rfind(b'\n') + 1  # A word still being written is read next time
+    word_delta_offset += complete
+    words = [word for word in appended[:complete].decode('ascii', errors='ignore').split() if normalize_word(word) == word]
+    added = insert_words(words)
+    if added:
+        logger.info(f"Added {added} learned words from {WORD_DELTA_FILE} to the word index.")
+
+def learn_word(word: str) -> bool:
+    """
+    Adds the word of a finished game to the loaded index if it is missing, normalized like the
+    word list in preprocess.py, and appends it to WORD_DELTA_FILE. Once WORD_DELTA_MERGE_SIZE words
+    are learned, they are merged into the index files in the background. Runs on the solver thread.
+    Returns whether the word was added.
+    """
+    normalized = normalize_word(word)
+    if normalized is None or not insert_words([normalized]):
         return False
+    logger.info(f"Learned new word '{normalized}'.")
+    try:
+        with open(WORD_DELTA_FILE, 'a', encoding='ascii') as f:
+            f.write(f"{normalized}\n")
+    except Exception as e:
+        logger.error(f"Error writing learned word: {e}")
+    if learned_word_count >= WORD_DELTA_MERGE_SIZE:
+        start_merge()
     return True
 
-async def get_possible_words(word_state: str, guessed_letters: List[str], incorrect_letters: Set[str]) -> List[str]:
+def start_merge() -> None:
+    """Starts merging the learned words into the index files unless a merge is running."""
+    global merge_thread, learned_word_count
+    if merge_thread is not None and merge_thread.is_alive():
+        return
+    # Reads up to the end of WORD_DELTA_FILE, so every word before word_delta_offset is in the buckets
+    load_word_delta()
+    delta_position = (word_delta_inode, word_delta_offset) if word_delta_inode is not None else None
+    # Buckets are replaced, never modified, so the merge works on a consistent copy of the dictionaries
+    buckets = {'e': dict(word_matrix_e), 'ne': dict(word_matrix_ne)}
+    merge_thread = threading.Thread(target=merge_learned_words, args=(buckets, delta_position, word_index_base), name='word-merge', daemon=True)
+    merge_thread.start()
+    learned_word_count = 0  # The words learned from now on are counted towards the next merge
+
+def merge_learned_words(buckets: Dict[str, Dict[int, np.ndarray]], delta_position: Optional[Tuple[int, int]], base: Optional[float]) -> None:
     """
-    Filters the word_list to find all possible words that match the current word_state.
-    Utilizes multithreading for efficient processing.
+    Writes the buckets, learned words included, as new index files to LEARNED_INDEX_DIR in DATA_DIR.
+    Every file is replaced by a rename under the lock of the directory, and the new index is loaded
+    at the start of the next game. delta_position is the (inode, offset) of WORD_DELTA_FILE the buckets
+    contain the words up to, later loads only replay the words after it. base is the index_mtime of the
+    preprocessed index the buckets were loaded from, a rebuilt or newer one replaces the merged index.
     """
+    if base is None:
+        return
     start_time = time.time()
-    regex = build_regex_pattern(word_state)
-    incorrect_letters = set(letter.upper() for letter in incorrect_letters)
-    
-    updated_wordlist = word_list
-
-    if 'E' not in (letter.upper() for letter in incorrect_letters):
-        logger.debug("Using wordlist with 'E'")
-        updated_wordlist = word_list_e
-    elif 'E' in (letter.upper() for letter in incorrect_letters):
-        logger.debug("Using wordlist without 'E'")
-        updated_wordlist = word_list_ne
-
-    possible_words = []
-    num_threads = THREADCOUNT
-
-    def worker(words_chunk):
-        matched = []
-        for word in words_chunk:
-            if filter_word(word, regex, incorrect_letters):
-                matched.append(word)
-        return matched
-
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        chunk_size = max(len(updated_wordlist) // num_threads, 1)
-        futures = []
-        for i in range(num_threads):
-            start = i * chunk_size
-            end = (i + 1) * chunk_size if i != num_threads - 1 else len(updated_wordlist)
-            futures.append(executor.submit(worker, updated_wordlist[start:end]))
-        for future in as_completed(futures):
-            possible_words.extend(future.result())
-
-    logger.info(f"Filtered possible words in {time.time() - start_time:.4f} seconds. {len(possible_words)} words found.")
-    return possible_words
-
-@njit
-def letter_freq_worker(words_chunk, guessed_letters_bitmask):
-    """
-    Numba-optimized worker function to compute letter frequencies.
-    
-    Parameters:
-    - words_chunk (np.ndarray): 2D array of ASCII values representing words.
-    - guessed_letters_bitmask (int): Bitmask representing guessed letters.
-    
-    Returns:
-    - np.ndarray: Array of counts for each letter a-z.
+    index = {'e': {}, 'ne': {}}
+    for key, matrices in buckets.items():
+        for length, matrix in matrices.items():
+            data = matrix.tobytes().decode('ascii')
+            index[key][length] = sorted(data[i:i + length] for i in range(0, len(data), length))
+    try:
+        os.makedirs(LEARNED_INDEX_DIR, exist_ok=True)
+        with index_lock(LEARNED_INDEX_DIR, exclusive=True):
+            saved = save_word_matrix(index, LEARNED_INDEX_DIR, delta_position)
+            if saved:
+                # Written last, the bots only switch to a complete merged index
+                save_index_file(os.path.join(LEARNED_INDEX_DIR, LEARNED_INDEX_BASE_FILE), np.array([base], dtype=np.float64))
+    except Exception as e:
+        logger.error(f"Error merging the learned words: {e}")
+        return
+    if saved:
+        logger.info(f"Merged the learned words into the word index in {time.time() - start_time:.4f} seconds.")
+
+def load_opening_book(book_file: str = OPENING_BOOK_FILE) -> None:
+    global opening_book
+    try:
+        with open(book_file, 'rb') as f:
+            book = pickle.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Opening book not found at {book_file}. Early rounds are computed live.")
+        return
+    except Exception as e:
+        logger.error(f"Error loading opening book: {e}")
+        return
+
+    if book['mode'] != SCORING_MODE:
+        logger.warning(f"Opening book was built for '{book['mode']}' scoring, not '{SCORING_MODE}'. Ignoring it.")
+        opening_book = {}
+        return
+    opening_book = book['entries']
+    logger.info(f"Loaded opening book with {len(opening_book)} entries up to depth {book['depth']}.")
+
+# Set once the word index and the opening book are loaded
+initialized = False
+
+def initialize() -> None:
     """
-    local_counter = np.zeros(26, dtype=np.int32)  # For letters a-z
-    
-    num_words, word_length = words_chunk.shape
-    
-    for i in range(num_words):
-        word_bitmask = 0
-        
-        # Create a bitmask for unique letters in the word
-        for j in range(word_length):
-            char = words_chunk[i, j]
-            if char == 0:
-                break  # Reached padding
-            idx = char - 97  # 'a' has ASCII 97
-            if 0 <= idx < 26:
-                word_bitmask |= (1 << idx)
-        
-        # Exclude guessed letters
-        available_bitmask = word_bitmask & (~guessed_letters_bitmask)
-        
-        # Update the counter
-        for k in range(26):
-            if (available_bitmask >> k) & 1:
-                local_counter[k] += 1
-                
-    return local_counter
-
-async def compute_letter_frequencies(possible_words: List[str], guessed_letters_set: Set[str]) -> Dict[str, int]:
-    """
-    Computes the frequency of each letter in the possible_words.
-    Utilizes Numba for efficient processing.
-    Returns a dictionary with letter frequencies.
+    Loads the word index and the opening book. Importing this module loads nothing,
+    this runs on the first decision unless the caller starts it explicitly.
+    The precomputed letter frequencies are not used by the strategy and stay unloaded,
+    call load_precomputed_frequencies() if they are needed.
+    """
+    global initialized
+    load_clean_wordlist()
+    load_opening_book()
+    initialized = True
+
+def select_candidates(word_state: str, words: np.ndarray, bitsets: np.ndarray, incorrect_letters: Set[str]) -> np.ndarray:
+    """
+    Returns the row indices of the words in the bucket that match the word_state.
+    Revealed positions are AND-ed with their letter bitset. Blank positions
+    cannot hold an already revealed letter, and words containing an incorrect
+    letter are removed with AND-NOT.
+    """
+    if words is None or len(words) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    candidates = np.full(bitsets.shape[2], 0xFF, dtype=np.uint8)
+    revealed = set(word_state) - {'_'}
+    for letter in revealed | incorrect_letters:
+        if not 'A' <= letter <= 'Z':
+            # The clean wordlist only contains A-Z
+            return np.empty(0, dtype=np.intp)
+    revealed_idx = [ord(letter) - ord('A') for letter in revealed]
+
+    for pos, c in enumerate(word_state):
+        if c == '_':
+            for idx in revealed_idx:
+                candidates &= ~bitsets[pos, idx]
+        else:
+            candidates &= bitsets[pos, ord(c) - ord('A')]
+
+    for letter in incorrect_letters:
+        contains_letter = np.bitwise_or.reduce(bitsets[:, ord(letter) - ord('A')], axis=0)
+        candidates &= ~contains_letter
+
+    return np.flatnonzero(np.unpackbits(candidates, count=len(words)))
+
+def get_possible_words(word_state: str, guessed_letters: List[str], incorrect_letters: Set[str], state: CandidateState) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Filters the word matrix to find all possible words that match the current word_state
+    and computes the frequency of each unguessed letter among them.
+    Only words with the same length as the word_state are considered. The positional
+    letter bitsets select the first candidates of a game, later rounds start from the
+    candidates of the previous round. Filtering and counting run in one parallel kernel.
+    Returns the matching words as rows of a uint8 matrix of ASCII letters,
+    together with the letter frequencies.
     """
     start_time = time.time()
-    letter_counts = Counter()
-    num_threads = THREADCOUNT
-
-    # Initialize with the first 100 words
-    words_subset = possible_words[:100]
-
-    # Preprocess words: convert to lowercase and filter non-alphabetic characters
-    sanitized_words = [''.join(filter(str.isalpha, word.lower())) for word in words_subset]
-
-    # Determine the maximum word length for fixed-length array
-    max_length = max(len(word) for word in sanitized_words) if sanitized_words else 0
-
-    # Create a 2D NumPy array filled with zeros (padding shorter words)
-    words_np = np.zeros((len(sanitized_words), max_length), dtype=np.int32)
-
-    for i, word in enumerate(sanitized_words):
-        ascii_values = [ord(char) for char in word]
-        words_np[i, :len(ascii_values)] = ascii_values
-
-    # Convert guessed_letters_set to lowercase and create a bitmask
-    guessed_letters = set(letter.lower() for letter in guessed_letters_set)
-    guessed_letters_bitmask = 0
-    for letter in guessed_letters:
-        idx = ord(letter) - ord('a')
-        if 0 <= idx < 26:
-            guessed_letters_bitmask |= (1 << idx)
-
-    # Since Numba functions are not async, run them in a separate thread to avoid blocking
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        # Split the words_np into chunks for each thread
-        chunk_size = max(len(sanitized_words) // num_threads, 1)
-        futures = []
-        for i in range(num_threads):
-            start = i * chunk_size
-            end = (i + 1) * chunk_size if i != num_threads - 1 else len(sanitized_words)
-            chunk = words_np[start:end]
-            futures.append(loop.run_in_executor(executor, letter_freq_worker, chunk, guessed_letters_bitmask))
-        
-        # Gather results as they complete
-        results = await asyncio.gather(*futures)
-    
-    for count_array in results:
-    # Convert lowercase letters to uppercase in the dictionary
-        uppercase_counts = {chr(65 + i): count for i, count in enumerate(count_array)}  # 65 is ASCII for 'A'
-        letter_counts.update(uppercase_counts)
+    generation = state.generation
+    word_state = word_state.upper()
+    incorrect_letters = set(letter.upper() for letter in incorrect_letters)
+    guessed_letters_set = set(letter.upper() for letter in guessed_letters)
 
-    logger.info(f"Computed letter frequencies in {time.time() - start_time:.4f} seconds.")
-    return dict(letter_counts)
+    if 'E' not in incorrect_letters:
+        round_logger.debug("Using wordlist with 'E'")
+        words = word_matrix_e.get(len(word_state))
+        masks = word_masks_e.get(len(word_state))
+        bitsets = word_bitsets_e.get(len(word_state))
+    else:
+        round_logger.debug("Using wordlist without 'E'")
+        words = word_matrix_ne.get(len(word_state))
+        masks = word_masks_ne.get(len(word_state))
+        bitsets = word_bitsets_ne.get(len(word_state))
+
+    phase_start = time.perf_counter()
+    if state.can_refine(word_state, incorrect_letters, words):
+        rows = state.indices
+    else:
+        rows = select_candidates(word_state, words, bitsets, incorrect_letters)
+    state.phase_times['filtering'] = time.perf_counter() - phase_start
+
+    phase_start = time.perf_counter()
+    indices, letter_frequencies = filter_and_count(words, masks, rows, word_state, incorrect_letters, guessed_letters_set)
+    state.phase_times['counting'] = time.perf_counter() - phase_start
+
+    state.update(generation, word_state, incorrect_letters, words, indices, letter_frequencies)
+    possible_words = words[indices] if len(indices) else np.empty((0, len(word_state)), dtype=np.uint8)
+
+    round_logger.info("Filtered possible words and computed letter frequencies in %.4f seconds. %d words found.", time.time() - start_time, len(possible_words))
+    return possible_words, letter_frequencies
 
 # Define all uppercase English letters
 all_letters = set('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
@@ -269,26 +582,83 @@ german_letter_freq = {
     'Q': 0.02
 }
 
-word_not_found = False
+# Runs the solver and the word list reloads off the event loop. A single thread, as every
+# kernel call already uses all Numba threads and not every Numba threading layer is thread-safe.
+solver_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='solver')
 
-async def get_next_letter(word_state: str, guessed_letters: List[str], incorrect_letters: Set[str]) -> str:
-    start_time = time.time()
+def fallback_letter(guessed_letters: List[str], state: CandidateState) -> Optional[str]:
+    """
+    Returns the best letter without running the solver: the unguessed letter contained in
+    the most candidates of the previous round, or the most common unguessed German letter.
+    """
+    guessed_letters_set = set(letter.upper() for letter in guessed_letters)
+    frequencies = {letter: count for letter, count in state.letter_frequencies.items() if count > 0 and letter not in guessed_letters_set}
+    if frequencies:
+        return max(frequencies, key=frequencies.get)
+    unguessed_letters = all_letters - guessed_letters_set
+    if not unguessed_letters:
+        return None
+    return max(unguessed_letters, key=lambda letter: german_letter_freq.get(letter, 0))
+
+async def get_next_letter(word_state: str, guessed_letters: List[str], incorrect_letters: Set[str],
+                          state: Optional[CandidateState] = None, deadline: Optional[float] = None) -> str:
+    """
+    Returns the next letter to guess, answering repeated states from the decision cache.
+    state holds the candidates of the caller's game, the module-level candidate_state by default.
+    The solver runs on solver_executor. If it has not answered within deadline seconds, the
+    fallback letter is returned and the decision is cached once the solver finishes.
+    """
+    if state is None:
+        state = candidate_state
+    loop = asyncio.get_running_loop()
+    if not initialized:
+        await loop.run_in_executor(solver_executor, initialize)
+    state.phase_times.clear()
+    key = (word_state.upper(), ''.join(sorted(set(letter.upper() for letter in guessed_letters))))
+    next_letter = decision_cache.get(key)
+    if next_letter is not None:
+        round_logger.debug("Selected next letter '%s' from the decision cache.", next_letter)
+        return next_letter
+
+    # Runs in a copy of the caller's context, which carries the round sampling decision
+    future = loop.run_in_executor(solver_executor, contextvars.copy_context().run, compute_next_letter,
+                                  word_state, guessed_letters, incorrect_letters, state)
+    try:
+        next_letter = await asyncio.wait_for(asyncio.shield(future), deadline)
+    except asyncio.TimeoutError:
+        def cache_late_decision(done: asyncio.Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                decision_cache.put(key, done.result())
+        future.add_done_callback(cache_late_decision)
+        next_letter = fallback_letter(guessed_letters, state)
+        logger.warning(f"Solver missed the {deadline} second deadline. Guessing '{next_letter}' instead.")
+        return next_letter
+    decision_cache.put(key, next_letter)
+    return next_letter
 
-    global word_not_found
-    word_not_found = False
+def compute_next_letter(word_state: str, guessed_letters: List[str], incorrect_letters: Set[str], state: CandidateState) -> Optional[str]:
+    """
+    Runs the solver for one turn. Blocks for the whole computation, get_next_letter runs it on solver_executor.
+    """
+    start_time = time.time()
 
     # Always guess 'E' first if it hasn't been guessed yet
     if 'E' not in (letter.upper() for letter in guessed_letters):
-        logger.info("Guessing 'E' as it is the most common German letter.")
+        round_logger.info("Guessing 'E' as it is the most common German letter.")
         return 'E'
 
     guessed_letters_set = set(letter.upper() for letter in guessed_letters)
-    possible_words = await get_possible_words(word_state, guessed_letters, incorrect_letters)
-    if not possible_words:
+    phase_start = time.perf_counter()
+    book_letter = opening_book.get((word_state.upper(), ''.join(sorted(guessed_letters_set))))
+    if book_letter is not None:
+        state.phase_times['decision'] = time.perf_counter() - phase_start
+        round_logger.info("Selected next letter '%s' from the opening book in %.4f seconds.", book_letter, time.time() - start_time)
+        return book_letter
+
+    possible_words, letter_frequencies = get_possible_words(word_state, guessed_letters, incorrect_letters, state)
+    if len(possible_words) == 0:
         logger.warning("No possible words computed.")
 
-        word_not_found = True
-        
         # Determine unguessed letters
         unguessed_letters = all_letters - guessed_letters_set
     
@@ -306,8 +676,6 @@ async def get_next_letter(word_state: str, guessed_letters: List[str], incorrect
             logger.warning("No unguessed letters remaining.")
             return None  # Or handle this case as needed
 
-    letter_frequencies = await compute_letter_frequencies(possible_words, guessed_letters_set)
-
     if not letter_frequencies:
         logger.warning("No letter frequencies computed.")
     
@@ -328,16 +696,33 @@ async def get_next_letter(word_state: str, guessed_letters: List[str], incorrect
             logger.warning("No unguessed letters remaining.")
             return None  # Or handle this case as needed
 
-    # Find the letter with the highest frequency
-    next_letter = max(letter_frequencies, key=letter_frequencies.get)
+    phase_start = time.perf_counter()
+    next_letter = choose_letter(possible_words, letter_frequencies, SCORING_MODE)
+    state.phase_times['decision'] = time.perf_counter() - phase_start
     end_time = time.time()
-    logger.info(f"Selected next letter '{next_letter}' based on highest frequency in {end_time - start_time:.4f} seconds.")
+    round_logger.info("Selected next letter '%s' based on %s scoring in %.4f seconds.", next_letter, SCORING_MODE, end_time - start_time)
     return next_letter
 
-def reset_dynamic_data():
-    pass
+def reset_dynamic_data(state: Optional[CandidateState] = None):
+    """
+    Resets the per-game data at the start of a new game and picks up a rebuilt word list.
+    state is the caller's CandidateState, the module-level candidate_state by default.
+    """
+    (state if state is not None else candidate_state).reset()
+    if not initialized:
+        initialize()
+        return
+
+    previous_mtime = word_list_mtime
+    load_clean_wordlist()
+    if word_list_mtime != previous_mtime:
+        load_opening_book()
+    else:
+        load_word_delta()
 
 def handle_game_result(won: bool):
     start_time = time.time()
+    logger.info(f"Decision cache: {decision_cache.hits} hits, {decision_cache.misses} misses "
+                f"({decision_cache.hit_rate() * 100:.2f}% hit rate), {len(decision_cache.entries)} entries.")
     end_time = time.time()
     logger.info(f"Handled game result in {end_time - start_time:.4f} seconds.")
@@ -1,12 +1,58 @@
+import atexit
+import itertools
 import os
 import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from contextvars import ContextVar
+from logging.handlers import BaseRotatingHandler, QueueHandler, RotatingFileHandler
+from typing import List, Optional
 
 # Default Thread count
-# WARNING: The Bot uses double the number of threads specified here per instance
+# Used by the parallel Numba kernels, capped at the number of available cores
 THREADCOUNT = 20
 
+# Default letter scoring mode
+# 'frequency': most candidates contain the letter
+# 'entropy': highest entropy of the position patterns the letter would reveal
+# 'expected': lowest expected number of remaining candidates after the guess
+SCORING_MODE = 'frequency'
+
+# Default number of decisions after the first guess stored in the opening book
+OPENING_BOOK_DEPTH = 2
+
+# Default number of (word_state, guessed letters) decisions kept in memory
+DECISION_CACHE_SIZE = 10000
+
+# Default seconds the solver may take per turn before the best letter found so far is sent
+TURN_DEADLINE = 1.0
+
+# Default game server
+SERVER_URL = 'https://games.uhno.de'
+
+# Default number of rounds whose per-round messages are logged, one out of LOG_ROUND_SAMPLE
+LOG_ROUND_SAMPLE = 1
+
+# Default maximum number of log records the background writer writes per flush
+LOG_BATCH_SIZE = 256
+
+# Publish the word index to the data volume, so that all bot containers sharing it map the same files
+SHARED_INDEX = False
+
+# Default address of the phase latency endpoint, a port of 0 disables it
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9100
+
+# Default number of games after which the bot saves a snapshot of its statistics
+STATS_SNAPSHOT_INTERVAL = 100
+
+# Default number of learned words kept in memory before they are merged into the word index files
+WORD_DELTA_MERGE_SIZE = 50
+
+# Default number of rounds profiled after SIGUSR1 or POST /profile
+PROFILE_ROUNDS = 100
+
 DATA_DIR = '../data'
 CONFIG_DIR = '../config'
 PKL_DIR = './pkls'
@@ -16,53 +62,189 @@ LIST_DIR = './lists'
 IsInDockerContainer = os.environ.get('AM_I_IN_A_DOCKER_CONTAINER', False)
 IsFarmBot = os.environ.get('Farm', False)
 THREADCOUNT = int(os.environ.get('THREADCOUNT', THREADCOUNT))
+SCORING_MODE = os.environ.get('SCORING_MODE', SCORING_MODE)
+OPENING_BOOK_DEPTH = int(os.environ.get('OPENING_BOOK_DEPTH', OPENING_BOOK_DEPTH))
+DECISION_CACHE_SIZE = int(os.environ.get('DECISION_CACHE_SIZE', DECISION_CACHE_SIZE))
+SERVER_URL = os.environ.get('SERVER_URL', SERVER_URL)
+TURN_DEADLINE = float(os.environ.get('TURN_DEADLINE', TURN_DEADLINE))
+LOG_ROUND_SAMPLE = max(1, int(os.environ.get('LOG_ROUND_SAMPLE', LOG_ROUND_SAMPLE)))
+LOG_BATCH_SIZE = max(1, int(os.environ.get('LOG_BATCH_SIZE', LOG_BATCH_SIZE)))
+SHARED_INDEX = os.environ.get('SHARED_INDEX', str(SHARED_INDEX)).lower() in ('1', 'true', 'yes')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', METRICS_PORT))
+PROFILE_ROUNDS = int(os.environ.get('PROFILE_ROUNDS', PROFILE_ROUNDS))
+WORD_DELTA_MERGE_SIZE = max(1, int(os.environ.get('WORD_DELTA_MERGE_SIZE', WORD_DELTA_MERGE_SIZE)))
+STATS_SNAPSHOT_INTERVAL = max(1, int(os.environ.get('STATS_SNAPSHOT_INTERVAL', STATS_SNAPSHOT_INTERVAL)))
 
 if IsInDockerContainer:
+    # Reachable from the api container, the port is not published to the host
+    METRICS_HOST = '0.0.0.0'
     DATA_DIR = '/app/data'
     CONFIG_DIR = '/app/config'
     PKL_DIR = '/app/pkls'
     LIST_DIR = '/app/lists'
 
+# Allows tools like localserver.py to keep test runs out of the real data directory
+DATA_DIR = os.environ.get('DATA_DIR', DATA_DIR)
+METRICS_HOST = os.environ.get('METRICS_HOST', METRICS_HOST)
+
 LOG_DIR = os.path.join(DATA_DIR, 'logs')
 CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
 LOG_FILE = os.path.join(LOG_DIR, 'bot.log')
 RESULTS_FILE = os.path.join(DATA_DIR, 'results.txt')
+RESULTS_DB_FILE = os.path.join(DATA_DIR, 'results.db')
+STATS_SNAPSHOT_FILE = os.path.join(DATA_DIR, 'stats_snapshot.json')
+WORD_DELTA_FILE = os.path.join(DATA_DIR, 'learned_words.txt')
+STARTUP_FILE = os.path.join(DATA_DIR, 'startup.txt')
+PROFILE_DIR = os.path.join(DATA_DIR, 'profiles')
 SINGLE_LETTER_FREQ_FILE = os.path.join(PKL_DIR, 'single_letter_freq.pkl')
 PAIR_LETTER_FREQ_FILE = os.path.join(PKL_DIR, 'pair_letter_freq.pkl')
 OVERALL_LETTER_FREQ_FILE = os.path.join(PKL_DIR, 'overall_letter_freq.pkl')
-CLEAN_WORDLIST_FILE = os.path.join(PKL_DIR, 'clean_wordlist.pkl')
-CLEAN_WORDLIST_FILE_E = os.path.join(PKL_DIR, 'clean_wordlist_e.pkl')
-CLEAN_WORDLIST_FILE_NE = os.path.join(PKL_DIR, 'clean_wordlist_ne.pkl')
+CLEAN_WORDS_FILE = os.path.join(PKL_DIR, 'clean_words.npy')
+CLEAN_WORD_OFFSETS_FILE = os.path.join(PKL_DIR, 'clean_word_offsets.npy')
+CLEAN_WORD_BITSETS_FILE = os.path.join(PKL_DIR, 'clean_word_bitsets.npy')
+CLEAN_WORD_MASKS_FILE = os.path.join(PKL_DIR, 'clean_word_masks.npy')
+CLEAN_WORD_DELTA_FILE = os.path.join(PKL_DIR, 'clean_word_delta.npy')
+OPENING_BOOK_FILE = os.path.join(PKL_DIR, 'opening_book.pkl')
+SHARED_INDEX_DIR = os.path.join(DATA_DIR, 'index')
+LEARNED_INDEX_DIR = os.path.join(DATA_DIR, 'learned_index')
 WORD_LIST_FILE = os.path.join(LIST_DIR, 'wordlist.txt')
 
+# Importing this module has no side effects. config.json is read on first use,
+# and entry points call setup_logging() before they log anything.
+loaded_config: Optional[dict] = None
+log_writer: Optional['LogWriter'] = None
+
 def load_config():
     with open(CONFIG_FILE, 'r') as f:
         return json.load(f)
 
-CONFIG = load_config()
+def get_config() -> dict:
+    """Returns the contents of config.json, which is read once. Empty if the file does not exist."""
+    global loaded_config
+    if loaded_config is None:
+        try:
+            loaded_config = load_config()
+        except FileNotFoundError:
+            loaded_config = {}
+    return loaded_config
+
+def get_secrets() -> List[str]:
+    """
+    Returns the secrets of all bot identities run by this process, comma separated in BOT_SECRETS
+    or a "SECRETS" list in config.json. BOT_SECRET or the "SECRET" in config.json run a single identity.
+    """
+    secrets = [secret.strip() for secret in os.environ.get('BOT_SECRETS', '').split(',') if secret.strip()]
+    if secrets:
+        return secrets
+    if os.environ.get('BOT_SECRET'):
+        return [os.environ['BOT_SECRET']]
+    config = get_config()
+    if config.get("SECRETS"):
+        return list(config["SECRETS"])
+    return [config["SECRET"]] if config.get("SECRET") else []
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues log records as they are, so that formatting happens on the writer thread."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class LogWriter(threading.Thread):
+    """
+    Background thread that takes log records off the queue in batches of up to batch_size
+    and writes each batch to the handlers with a single flush.
+    """
+    def __init__(self, log_queue: queue.SimpleQueue, handlers: List[logging.Handler], batch_size: int):
+        super().__init__(name='log-writer', daemon=True)
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+
+    def run(self) -> None:
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:  # Sentinel put by stop()
+                batch = batch[:batch.index(None)]
+                running = False
+            for handler in self.handlers:
+                self.write(handler, batch)
 
-# Get SECRET from environment variable
-SECRET = os.environ.get('BOT_SECRET')
+    def write(self, handler: logging.Handler, batch: List[logging.LogRecord]) -> None:
+        handler.acquire()
+        try:
+            for record in batch:
+                if record.levelno < handler.level or not handler.filter(record):
+                    continue
+                try:
+                    if not isinstance(handler, logging.StreamHandler):
+                        handler.emit(record)
+                        continue
+                    if isinstance(handler, BaseRotatingHandler) and handler.shouldRollover(record):
+                        handler.doRollover()
+                    handler.stream.write(handler.format(record) + handler.terminator)
+                except Exception:
+                    handler.handleError(record)
+            handler.flush()
+        finally:
+            handler.release()
 
-if not SECRET:
-    SECRET = CONFIG["SECRET"]
+    def stop(self) -> None:
+        """Writes the remaining records and ends the thread."""
+        self.queue.put(None)
+        self.join()
 
-# Ensure directories exist
-os.makedirs(LOG_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
+def setup_logging() -> None:
+    """
+    Creates the data and log directories and sends all log records through a queue to a
+    background LogWriter, which writes them to the console and the rotating log file.
+    Runs once, the records left at exit are written by an atexit hook.
+    """
+    global log_writer
+    if log_writer is not None:
+        return
 
-# Configure logging
-logging.basicConfig(level=getattr(logging, CONFIG.get("LOG_LEVEL", "INFO")),
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
+    # Ensure directories exist
+    os.makedirs(LOG_DIR, exist_ok=True)
+    os.makedirs(DATA_DIR, exist_ok=True)
 
-# Create a rotating file handler
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10*1024*1024, backupCount=5)
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    # Create a rotating file handler
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10*1024*1024, backupCount=5)
+    file_handler.setFormatter(formatter)
 
-# Get the root logger and add the file handler
-root_logger = logging.getLogger()
-root_logger.addHandler(file_handler)
+    log_queue = queue.SimpleQueue()
+    log_writer = LogWriter(log_queue, [console_handler, file_handler], LOG_BATCH_SIZE)
+    log_writer.start()
+    atexit.register(log_writer.stop)
+
+    # The root logger only queues records, so logging never writes on the calling thread
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, get_config().get("LOG_LEVEL", "INFO")))
+    root_logger.addHandler(DeferredQueueHandler(log_queue))
+
+# Whether the per-round messages of the current round are logged, set by sample_round()
+round_sampled: ContextVar[bool] = ContextVar('round_sampled', default=True)
+round_counter = itertools.count()
+
+def sample_round() -> None:
+    """Decides for the current round, and the calls it makes, if its per-round messages are logged."""
+    round_sampled.set(next(round_counter) % LOG_ROUND_SAMPLE == 0)
+
+class RoundSampleFilter(logging.Filter):
+    """Drops the messages of rounds that were not sampled."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        return round_sampled.get()
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
+
+# Logger for the messages logged every round, which are subject to LOG_ROUND_SAMPLE
+round_logger = logging.getLogger(f"{__name__}.round")
+round_logger.addFilter(RoundSampleFilter())
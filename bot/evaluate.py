@@ -0,0 +1,149 @@
+# Offline evaluation of the advancedlogic strategy.
+# Plays every word of the clean wordlist (or a sample) without a server,
+# spread over a process pool, and reports wrong guesses per word length,
+# per-turn time of each solver phase and the total CPU time.
+#
+# Example: python evaluate.py --sample 5000 --seed 1
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import advancedlogic
+from config import setup_logging, logger
+from solver import set_thread_count
+
+def clean_words() -> List[str]:
+    """Decodes all words of the loaded word matrix."""
+    words = []
+    for matrices in (advancedlogic.word_matrix_e, advancedlogic.word_matrix_ne):
+        for length, matrix in sorted(matrices.items()):
+            data = matrix.tobytes().decode('ascii')
+            words.extend(data[i:i + length] for i in range(0, len(data), length))
+    return words
+
+def init_worker(threads: int, use_cache: bool, use_book: bool) -> None:
+    """Configures a pool worker and loads the word index into it."""
+    setup_logging()
+    logger.setLevel(logging.WARNING)
+    set_thread_count(threads)
+    advancedlogic.initialize()
+    if not use_cache:
+        advancedlogic.decision_cache.max_size = 0
+    if not use_book:
+        advancedlogic.opening_book = {}
+
+async def play_word(word: str, result: dict) -> None:
+    """Plays one game the way main.handle_round does and records its statistics."""
+    advancedlogic.reset_dynamic_data()
+    guessed: List[str] = []
+    wrong_guesses = 0
+
+    while True:
+        word_state = ''.join(c if c in guessed else '_' for c in word)
+        if '_' not in word_state:
+            break
+        current_word_letters = set(word_state.replace('_', ''))
+        incorrect_letters = set(letter for letter in guessed if letter not in current_word_letters)
+
+        turn_start = time.perf_counter()
+        next_letter = await advancedlogic.get_next_letter(word_state, guessed, incorrect_letters)
+        result['turn_time'] += time.perf_counter() - turn_start
+        result['turns'] += 1
+        for phase, duration in advancedlogic.candidate_state.phase_times.items():
+            totals = result['phases'].setdefault(phase, [0.0, 0])
+            totals[0] += duration
+            totals[1] += 1
+
+        if next_letter is None or next_letter in guessed:
+            result['invalid_moves'] += 1
+            next_letter = next(letter for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' if letter not in guessed)
+        guessed.append(next_letter)
+        if next_letter not in word:
+            wrong_guesses += 1
+
+    stats = result['lengths'].setdefault(len(word), [0, 0, 0])  # games, wrong guesses, max wrong guesses
+    stats[0] += 1
+    stats[1] += wrong_guesses
+    stats[2] = max(stats[2], wrong_guesses)
+
+async def play_words(words: List[str], result: dict) -> None:
+    for word in words:
+        await play_word(word, result)
+
+def evaluate_words(words: List[str]) -> dict:
+    """Pool task: plays a chunk of words and returns its statistics."""
+    result = {'lengths': {}, 'phases': {}, 'turns': 0, 'turn_time': 0.0, 'invalid_moves': 0}
+    cpu_start = time.process_time()
+    asyncio.run(play_words(words, result))
+    result['cpu_time'] = time.process_time() - cpu_start
+    return result
+
+def merge_results(results: List[dict]) -> dict:
+    merged = {'lengths': {}, 'phases': {}, 'turns': 0, 'turn_time': 0.0, 'invalid_moves': 0, 'cpu_time': 0.0}
+    for result in results:
+        for length, (games, wrong, max_wrong) in result['lengths'].items():
+            stats = merged['lengths'].setdefault(length, [0, 0, 0])
+            stats[0] += games
+            stats[1] += wrong
+            stats[2] = max(stats[2], max_wrong)
+        for phase, (duration, count) in result['phases'].items():
+            totals = merged['phases'].setdefault(phase, [0.0, 0])
+            totals[0] += duration
+            totals[1] += count
+        for key in ('turns', 'turn_time', 'invalid_moves', 'cpu_time'):
+            merged[key] += result[key]
+    return merged
+
+def log_report(merged: dict, wall_time: float) -> None:
+    games = sum(stats[0] for stats in merged['lengths'].values())
+    wrong = sum(stats[1] for stats in merged['lengths'].values())
+    logger.info(f"Games: {games}, wrong guesses: {wrong} ({wrong / games if games else 0:.3f} per game), "
+                f"invalid moves: {merged['invalid_moves']}")
+    logger.info("Wrong guesses per word length:")
+    for length, (length_games, length_wrong, max_wrong) in sorted(merged['lengths'].items()):
+        logger.info(f"  Word Length {length}: Average {length_wrong / length_games:.3f}, Max {max_wrong} over {length_games} game(s)")
+
+    turns = merged['turns']
+    logger.info(f"Turns: {turns}, average turn time {merged['turn_time'] / turns * 1000 if turns else 0:.4f} ms")
+    for phase, (duration, count) in sorted(merged['phases'].items()):
+        logger.info(f"  Phase {phase}: average {duration / count * 1000:.4f} ms over {count} turn(s), "
+                    f"{duration / turns * 1000 if turns else 0:.4f} ms per turn")
+    logger.info(f"Total CPU time: {merged['cpu_time']:.2f} seconds, wall time: {wall_time:.2f} seconds")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plays the advancedlogic strategy against the clean wordlist without a server.")
+    parser.add_argument('--sample', type=int, default=0, help="Number of words to sample, all words by default")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processes in the pool")
+    parser.add_argument('--threads', type=int, default=1, help="Numba threads per worker")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Words per pool task")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the decision cache")
+    parser.add_argument('--no-book', action='store_true', help="Disable the opening book")
+    args = parser.parse_args()
+
+    setup_logging()
+    advancedlogic.initialize()
+    words = clean_words()
+    if not words:
+        raise SystemExit("The clean wordlist is empty. Please run preprocess.py first.")
+    if args.sample and args.sample < len(words):
+        words = random.Random(args.seed).sample(words, args.sample)
+    chunks = [words[i:i + args.chunk_size] for i in range(0, len(words), args.chunk_size)]
+    logger.info(f"Evaluating {len(words)} words in {len(chunks)} chunks with {args.workers} workers.")
+
+    wall_start = time.perf_counter()
+    # Spawned rather than forked workers: Numba's threading layer is not fork-safe
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(args.threads, not args.no_cache, not args.no_book)) as executor:
+        results = list(executor.map(evaluate_words, chunks))
+    log_report(merge_results(results), time.perf_counter() - wall_start)
+
+if __name__ == '__main__':
+    main()
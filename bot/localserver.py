@@ -0,0 +1,212 @@
+# Local stand-in for the game server, used for load and regression testing.
+# It speaks the same socket.io protocol as the real server: bots authenticate,
+# then receive INIT, ROUND and RESULT messages on the 'data' event and answer
+# ROUND messages with the letter they guess.
+#
+# Example: python localserver.py --bots 4 --games 50
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import socketio
+from aiohttp import web
+
+from config import setup_logging, logger, WORD_LIST_FILE
+from preprocess import load_word_list
+
+# Games end after this many moves even if the bot never solves the word
+MAX_MOVES_PER_GAME = 52
+
+class LoadReport:
+    """Collects throughput, latency and error counts over a load test run."""
+    def __init__(self):
+        self.start_time = None
+        self.end_time = None
+        self.games = 0
+        self.turn_latencies: List[float] = []
+        self.wrong_guesses = 0
+        self.invalid_moves = 0
+        self.timeouts = 0
+        self.disconnects = 0
+        self.auth_failures = 0
+
+    def percentile(self, percent: float) -> float:
+        if not self.turn_latencies:
+            return 0.0
+        latencies = sorted(self.turn_latencies)
+        index = min(len(latencies) - 1, int(round(percent / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def log_summary(self) -> None:
+        elapsed = (self.end_time or time.perf_counter()) - (self.start_time or time.perf_counter())
+        games_per_sec = self.games / elapsed if elapsed > 0 else 0
+        errors = self.invalid_moves + self.timeouts + self.disconnects + self.auth_failures
+        logger.info(f"Games played: {self.games} in {elapsed:.2f} seconds ({games_per_sec:.2f} games/sec)")
+        logger.info(f"Turns: {len(self.turn_latencies)}, p50 latency {self.percentile(50) * 1000:.2f} ms, "
+                    f"p99 latency {self.percentile(99) * 1000:.2f} ms")
+        logger.info(f"Wrong guesses: {self.wrong_guesses} "
+                    f"({self.wrong_guesses / self.games if self.games else 0:.2f} per game)")
+        logger.info(f"Errors: {errors} (invalid moves {self.invalid_moves}, timeouts {self.timeouts}, "
+                    f"disconnects {self.disconnects}, authentication failures {self.auth_failures})")
+
+class LocalGameServer:
+    """Runs solo games for every authenticated connection."""
+    def __init__(self, words: List[str], games_per_bot: int, turn_timeout: float, secrets: List[str] = None, seed: int = None):
+        self.words = words
+        self.games_per_bot = games_per_bot
+        self.turn_timeout = turn_timeout
+        self.secrets = set(secrets) if secrets else None
+        self.random = random.Random(seed)
+        self.report = LoadReport()
+        self.players: Dict[str, str] = {}  # sid -> player id
+        self.finished_bots = 0
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.sio = socketio.AsyncServer(async_mode='aiohttp')
+        self.sio.on('authenticate', self.handle_authenticate)
+        self.sio.on('disconnect', self.handle_disconnect)
+
+    async def handle_authenticate(self, sid: str, secret: str) -> bool:
+        if self.secrets is not None and secret not in self.secrets:
+            logger.warning(f"Rejected bot {sid}: unknown secret.")
+            self.report.auth_failures += 1
+            return False
+        self.players[sid] = str(uuid.uuid4())
+        if self.report.start_time is None:
+            self.report.start_time = time.perf_counter()
+        self.tasks[sid] = asyncio.ensure_future(self.play_games(sid))
+        return True
+
+    async def handle_disconnect(self, sid: str, *args) -> None:
+        task = self.tasks.pop(sid, None)
+        if task is not None and not task.done():
+            logger.warning(f"Bot {sid} disconnected during a game.")
+            self.report.disconnects += 1
+            task.cancel()
+
+    async def play_games(self, sid: str) -> None:
+        try:
+            for _ in range(self.games_per_bot):
+                if not await self.play_game(sid):
+                    break
+        finally:
+            self.finished_bots += 1
+            self.report.end_time = time.perf_counter()
+
+    async def play_game(self, sid: str) -> bool:
+        """Plays one game against the bot. Returns False if the bot stopped responding."""
+        player_id = self.players[sid]
+        word = self.random.choice(self.words)
+        guessed: List[str] = []
+        log: List[Dict[str, str]] = []
+        score = 0
+
+        def message(message_type: str, word_state: str) -> dict:
+            return {
+                'type': message_type,
+                'players': [{'id': player_id, 'score': score}],
+                'log': list(log),
+                'self': player_id,
+                'word': word_state,
+                'guessed': list(guessed),
+            }
+
+        await self.sio.emit('data', {'type': 'INIT', 'players': [{'id': player_id, 'score': 0}], 'log': [], 'self': player_id}, to=sid)
+
+        for _ in range(MAX_MOVES_PER_GAME):
+            word_state = ''.join(c if c in guessed else '_' for c in word)
+            if '_' not in word_state:
+                break
+
+            start_time = time.perf_counter()
+            try:
+                letter = await self.sio.call('data', message('ROUND', word_state), to=sid, timeout=self.turn_timeout)
+            except socketio.exceptions.TimeoutError:
+                logger.warning(f"Bot {sid} did not answer within {self.turn_timeout} seconds.")
+                self.report.timeouts += 1
+                return False
+            self.report.turn_latencies.append(time.perf_counter() - start_time)
+
+            letter = letter.upper() if isinstance(letter, str) else ''
+            log.append({'player': player_id, 'move': letter})
+            if len(letter) != 1 or not 'A' <= letter <= 'Z' or letter in guessed:
+                self.report.invalid_moves += 1
+                score += 1
+                continue
+            guessed.append(letter)
+            if letter not in word:
+                self.report.wrong_guesses += 1
+                score += 1
+
+        await self.sio.emit('data', message('RESULT', word), to=sid)
+        self.report.games += 1
+        return True
+
+def spawn_bots(count: int, port: int, data_dir: str, per_process: int = 1, metrics_port: int = 0) -> List[subprocess.Popen]:
+    """
+    Starts count bots connected to the local server, per_process identities in each process.
+    With a metrics_port, the n-th process serves its phase latencies on metrics_port + n.
+    """
+    bots = []
+    for process, first in enumerate(range(0, count, per_process)):
+        secrets = ','.join(f"local-bot-{i}" for i in range(first, min(first + per_process, count)))
+        env = dict(os.environ, SERVER_URL=f"http://127.0.0.1:{port}", BOT_SECRETS=secrets, DATA_DIR=data_dir,
+                   METRICS_PORT=str(metrics_port + process if metrics_port else 0))
+        bots.append(subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')], env=env))
+    return bots
+
+async def run(server: LocalGameServer, args: argparse.Namespace) -> None:
+    app = web.Application()
+    server.sio.attach(app)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    logger.info(f"Local game server listening on {args.host}:{args.port} with {len(server.words)} words.")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='localserver-')
+    bots = spawn_bots(args.bots, args.port, data_dir, args.bots_per_process, args.metrics_port) if args.bots else []
+    try:
+        while not bots or server.finished_bots < args.bots:
+            if bots and all(bot.poll() is not None for bot in bots):
+                logger.error("All bot processes exited before finishing their games.")
+                break
+            await asyncio.sleep(0.5)
+    finally:
+        for bot in bots:
+            bot.terminate()
+        for bot in bots:
+            bot.wait()
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local socket.io game server for load and regression testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--words', default=WORD_LIST_FILE, help="Word list the secret words are drawn from")
+    parser.add_argument('--games', type=int, default=20, help="Games played per bot connection")
+    parser.add_argument('--bots', type=int, default=1, help="Bot processes to start; 0 serves externally started bots until interrupted")
+    parser.add_argument('--bots-per-process', type=int, default=1, help="Bot identities run by each bot process")
+    parser.add_argument('--turn-timeout', type=float, default=5.0, help="Seconds a bot may take per turn")
+    parser.add_argument('--data-dir', default=None, help="DATA_DIR of the spawned bots, a temporary directory by default")
+    parser.add_argument('--metrics-port', type=int, default=0, help="First metrics port of the spawned bot processes, disabled by default")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    setup_logging()
+    words = load_word_list(args.words)
+    if not words:
+        raise SystemExit(f"No usable words found in {args.words}")
+    secrets = [f"local-bot-{i}" for i in range(args.bots)] if args.bots else None
+    server = LocalGameServer(words, args.games, args.turn_timeout, secrets, args.seed)
+    try:
+        asyncio.run(run(server, args))
+    except KeyboardInterrupt:
+        pass
+    server.report.log_summary()
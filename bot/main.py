@@ -1,18 +1,31 @@
+import time
+startup_start = time.perf_counter()
 import asyncio
-from typing import Any, Dict, Set
+import json
+import os
+import signal
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Set
 import socketio
-from config import SECRET, logger, RESULTS_FILE, IsFarmBot, WORD_LIST_FILE
+from config import get_secrets, setup_logging, sample_round, logger, round_logger, RESULTS_FILE, RESULTS_DB_FILE, STATS_SNAPSHOT_FILE, STATS_SNAPSHOT_INTERVAL, STARTUP_FILE, IsFarmBot, SERVER_URL, TURN_DEADLINE, METRICS_HOST, METRICS_PORT, PROFILE_DIR, PROFILE_ROUNDS
 from models import DataDTOFactory, RoundDataDTO
+from metrics import phase_metrics, start_metrics_server
+from profiling import RoundProfiler
+from resultsdb import ResultsStore
+from solver import set_thread_count, warm_up
 from advancedlogic import (
+    CandidateState,
     get_next_letter,
     handle_game_result,
-    word_not_found
+    initialize,
+    learn_word,
+    reset_dynamic_data,
+    solver_executor
 )
-import time
-
-SERVER_URL = "https://games.uhno.de"
 
-sio = socketio.AsyncClient()
+# Durations in seconds of the startup phases, written to STARTUP_FILE once all clients are connected
+startup_times: Dict[str, float] = {'import': time.perf_counter() - startup_start}
 
 # Global statistics variables
 total_games = 0
@@ -21,88 +34,247 @@ total_new_words_added = 0  # New variable to track words added to the word list
 error_counts_per_word_length = {}  # key: word_length, value: {'errors': total_errors, 'games': num_games}
 total_time = 0
 total_turns = 0
-
-# Global variable for incorrect letters
-incorrect_letters: Set[str] = set()
-turn_times = []
+games_since_snapshot = 0  # Games finished since the stats snapshot was last updated
+
+# Game results database, opened by main()
+results_store: Optional[ResultsStore] = None
+
+# Profiles the next rounds on SIGUSR1 or POST /profile
+round_profiler = RoundProfiler(solver_executor, PROFILE_DIR)
+
+class BotSession:
+    """
+    One bot identity with its own server connection and game state.
+    All sessions of the process share the loaded word index and the compiled kernels.
+    """
+    def __init__(self, name: str, secret: str):
+        self.name = name
+        self.secret = secret
+        self.incorrect_letters: Set[str] = set()
+        self.turn_times: List[float] = []
+        self.candidates = CandidateState()
+        self.sio = socketio.AsyncClient()
+        self.sio.on('connect', self.connect)
+        self.sio.on('data', self.data)
+        self.sio.on('disconnect', self.disconnect)
+
+    async def connect(self) -> None:
+        """Handles the connection event."""
+        logger.info(f"[{self.name}] Connected to the server!")
+        await self.sio.emit('authenticate', self.secret, callback=self.handle_auth)
+
+    async def handle_auth(self, success: bool) -> None:
+        """Handles authentication response."""
+        if success:
+            logger.info(f"[{self.name}] Authentication successful")
+        else:
+            logger.error(f"[{self.name}] Authentication failed")
+            await self.sio.disconnect()
+
+    async def data(self, data: Dict[str, Any]) -> Any:
+        """Dispatches incoming data to the appropriate handler."""
+        message_type = data.get('type')
+        if message_type == 'ROUND':
+            return await handle_round(self, data)
+        elif message_type in handlers:
+            handler = handlers[message_type]
+            await handler(self, data)
+        else:
+            logger.error(f"Unknown message type received: {data}")
+
+    async def disconnect(self) -> None:
+        """Handles the disconnection event."""
+        logger.error(f"[{self.name}] Disconnected from the server!")
+
+    async def start(self) -> None:
+        await self.sio.connect(SERVER_URL, transports=['websocket'])
+
+class ResultsCheckpoint:
+    """
+    Totals of RESULTS_FILE up to a byte offset, saved to STATS_SNAPSHOT_FILE, so that
+    loading the results only replays the lines appended after the offset.
+    Replaying reads the file rather than counting this process's games, as several bots may share it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, inode: Optional[int]) -> None:
+        self.inode = inode
+        self.offset = 0
+        self.total_games = 0
+        self.total_wins = 0
+        self.total_time = 0.0
+        self.total_turns = 0
+        self.total_new_words_added = 0
+        self.error_counts_per_word_length: Dict[int, Dict[str, int]] = {}
+
+    def add_line(self, line: str) -> None:
+        # Expected format: 'win,word_length,error_count,total_time,num_turns,word_added'
+        parts = line.split(',')
+        if len(parts) != 6:
+            logger.warning(f"Invalid line in results file: {line}")
+            return
+        result, word_length_str, error_count_str, total_time_str, num_turns_str, word_added = parts
+        try:
+            word_length = int(word_length_str)
+            error_count = int(error_count_str)
+            total_time_game = float(total_time_str)
+            num_turns_game = int(num_turns_str)
+        except ValueError:
+            logger.warning(f"Invalid numbers in results file line: {line}")
+            return
+        self.total_games += 1
+        if result == 'win':
+            self.total_wins += 1
+        if word_length not in self.error_counts_per_word_length:
+            self.error_counts_per_word_length[word_length] = {'errors': 0, 'games': 0}
+        self.error_counts_per_word_length[word_length]['errors'] += error_count
+        self.error_counts_per_word_length[word_length]['games'] += 1
+        self.total_time += total_time_game
+        self.total_turns += num_turns_game
+        if word_added == 'yes':
+            self.total_new_words_added += 1
+
+    def replay(self) -> int:
+        """
+        Adds the complete lines appended to RESULTS_FILE since the offset and returns their number.
+        Starts over if the file was replaced or truncated. Raises FileNotFoundError without a results file.
+        """
+        with open(RESULTS_FILE, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.reset(stat.st_ino)
+            f.seek(self.offset)
+            replayed = 0
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break  # Still being written, replayed next time
+                self.offset += len(raw_line)
+                line = raw_line.decode('utf-8', errors='replace').strip()
+                if line:
+                    self.add_line(line)
+                    replayed += 1
+        return replayed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'inode': self.inode,
+            'offset': self.offset,
+            'total_games': self.total_games,
+            'total_wins': self.total_wins,
+            'total_time': self.total_time,
+            'total_turns': self.total_turns,
+            'total_new_words_added': self.total_new_words_added,
+            'error_counts_per_word_length': {str(k): v for k, v in self.error_counts_per_word_length.items()}
+        }
+
+    def save(self) -> None:
+        """
+        Writes the snapshot to a temporary file first, so that a crash never leaves a partial one.
+        The temporary name is unique, as bots in different containers share DATA_DIR and may all run as PID 1.
+        """
+        fd, temp_file = tempfile.mkstemp(prefix='.stats_snapshot.', suffix='.tmp', dir=os.path.dirname(STATS_SNAPSHOT_FILE))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f)
+            os.replace(temp_file, STATS_SNAPSHOT_FILE)
+        except BaseException:
+            os.remove(temp_file)
+            raise
+
+    @classmethod
+    def load(cls) -> 'ResultsCheckpoint':
+        """Returns the saved checkpoint, or an empty one if there is none or it cannot be read."""
+        checkpoint = cls()
+        try:
+            with open(STATS_SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            checkpoint.inode = snapshot['inode']
+            checkpoint.offset = snapshot['offset']
+            checkpoint.total_games = snapshot['total_games']
+            checkpoint.total_wins = snapshot['total_wins']
+            checkpoint.total_time = snapshot['total_time']
+            checkpoint.total_turns = snapshot['total_turns']
+            checkpoint.total_new_words_added = snapshot['total_new_words_added']
+            checkpoint.error_counts_per_word_length = {int(k): v for k, v in snapshot['error_counts_per_word_length'].items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable stats snapshot: {e}")
+            checkpoint = cls()
+        return checkpoint
+
+    def update(self) -> None:
+        """Replays the new lines and saves the snapshot, run off the event loop every STATS_SNAPSHOT_INTERVAL games."""
+        with self.lock:
+            try:
+                self.replay()
+                self.save()
+            except Exception as e:
+                logger.error(f"Error updating stats snapshot: {e}")
+
+results_checkpoint = ResultsCheckpoint()
 
 def load_results():
-    """Loads previous game results from RESULTS_FILE."""
+    """
+    Loads previous game results from the stats snapshot, replaying only the lines of
+    RESULTS_FILE appended after it, and saves the snapshot for the next start.
+    """
     global total_games, total_wins, error_counts_per_word_length
     global total_time, total_turns, total_new_words_added
-    total_time = 0
-    total_turns = 0
-    total_new_words_added = 0
+    global results_checkpoint
+    start_time = time.perf_counter()
+    results_checkpoint = ResultsCheckpoint.load()
+    snapshot_games = results_checkpoint.total_games
     try:
-        with open(RESULTS_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                # Parse the line
-                # Expected format: 'win,word_length,error_count,total_time,num_turns,word_added'
-                parts = line.split(',')
-                if len(parts) != 6:
-                    logger.warning(f"Invalid line in results file: {line}")
-                    continue
-                result, word_length_str, error_count_str, total_time_str, num_turns_str, word_added = parts
-                word_length = int(word_length_str)
-                error_count = int(error_count_str)
-                total_time_game = float(total_time_str)
-                num_turns_game = int(num_turns_str)
-                total_games += 1
-                if result == 'win':
-                    total_wins += 1
-                if word_length not in error_counts_per_word_length:
-                    error_counts_per_word_length[word_length] = {'errors': 0, 'games': 0}
-                error_counts_per_word_length[word_length]['errors'] += error_count
-                error_counts_per_word_length[word_length]['games'] += 1
-                total_time += total_time_game
-                total_turns += num_turns_game
-                if word_added == 'yes':
-                    total_new_words_added += 1
-        logger.info(f"Loaded previous results: {total_games} games, {total_wins} wins.")
+        replayed = results_checkpoint.replay()
     except FileNotFoundError:
         logger.info("Results file not found. Starting fresh statistics.")
+        return
     except Exception as e:
         logger.error(f"Error loading results: {e}")
-
-@sio.event
-async def connect() -> None:
-    """Handles the connection event."""
-    logger.info('Connected to the server!')
-    await sio.emit('authenticate', SECRET, callback=handle_auth)
-
-async def handle_auth(success: bool) -> None:
-    """Handles authentication response."""
-    if success:
-        logger.info("Authentication successful")
-    else:
-        logger.error("Authentication failed")
-        await sio.disconnect()
-
-def handle_init(data: Dict[str, Any]) -> None:
+        return
+    try:
+        results_checkpoint.save()
+    except Exception as e:
+        logger.error(f"Error saving stats snapshot: {e}")
+    total_games = results_checkpoint.total_games
+    total_wins = results_checkpoint.total_wins
+    total_time = results_checkpoint.total_time
+    total_turns = results_checkpoint.total_turns
+    total_new_words_added = results_checkpoint.total_new_words_added
+    error_counts_per_word_length = {k: dict(v) for k, v in results_checkpoint.error_counts_per_word_length.items()}
+    logger.info(f"Loaded previous results: {total_games} games, {total_wins} wins, "
+                f"{replayed} replayed after the snapshot of {snapshot_games} games in {time.perf_counter() - start_time:.4f} seconds.")
+
+async def handle_init(session: BotSession, data: Dict[str, Any]) -> None:
     """Handles game initialization."""
-    logger.info("New game initialized!")
-    global incorrect_letters, turn_times
-    incorrect_letters = set()  # Reset incorrect letters at the start of a new game
-    turn_times = []  # Reset turn times
-
-def add_word_to_list(word: str) -> None:
-    """Adds the word to the word list."""
-    global total_new_words_added
+    logger.info(f"[{session.name}] New game initialized!")
+    session.incorrect_letters = set()  # Reset incorrect letters at the start of a new game
+    session.turn_times = []  # Reset turn times
+    # Reset the candidates of the previous game. Runs on the solver thread, as it may reload
+    # the word list, and after any solver call of the previous game still in progress.
+    await asyncio.get_running_loop().run_in_executor(solver_executor, reset_dynamic_data, session.candidates)
+
+def save_result(line: str, game: Dict[str, Any]) -> None:
+    """Appends a game result line to RESULTS_FILE and records the game in the results database."""
     try:
-        with open(WORD_LIST_FILE, 'a', encoding='utf-8') as f:
-            f.write(f"{word}\n")
-        total_new_words_added += 1
+        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+            f.write(line)
     except Exception as e:
-        logger.error(f"Error adding word to list: {e}")
+        logger.error(f"Error writing to results file: {e}")
+    if results_store is not None:
+        try:
+            results_store.record_game(**game)
+        except Exception as e:
+            logger.error(f"Error writing to results database: {e}")
 
-def handle_result(data: Dict[str, Any]) -> None:
+async def handle_result(session: BotSession, data: Dict[str, Any]) -> None:
     """Handles the end of the game."""
-    logger.info("Game over!")
+    logger.info(f"[{session.name}] Game over!")
 
-    global total_games, total_wins, error_counts_per_word_length, total_time, total_turns, turn_times
+    global total_games, total_wins, error_counts_per_word_length, total_time, total_turns
     global total_new_words_added
 
     # Initialize variables
@@ -149,8 +321,8 @@ def handle_result(data: Dict[str, Any]) -> None:
     error_counts_per_word_length[word_length]['games'] += 1
 
     # Compute total time and number of turns
-    game_total_time = sum(turn_times)
-    game_num_turns = len(turn_times)
+    game_total_time = sum(session.turn_times)
+    game_num_turns = len(session.turn_times)
     if game_num_turns > 0:
         avg_time_per_turn = game_total_time / game_num_turns
     else:
@@ -158,24 +330,32 @@ def handle_result(data: Dict[str, Any]) -> None:
 
     logger.info(f"Average time per turn: {avg_time_per_turn:.2f} seconds")
 
-    # Check if the word was added to the word list
+    # Add the word to the live word index and WORD_DELTA_FILE if the index does not contain it yet
+    persistence_start = time.perf_counter()
     word_added = 'no'
-    if word_not_found == True:
-        add_word = add_word_to_list(final_word)
+    if await asyncio.get_running_loop().run_in_executor(solver_executor, learn_word, final_word):
+        total_new_words_added += 1
         word_added = 'yes'
 
-    # Save the result to RESULTS_FILE
-    try:
-        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
-            result = 'win' if bot_won else 'loss'
-            f.write(f"{result},{word_length},{your_score},{game_total_time},{game_num_turns},{word_added}\n")
-    except Exception as e:
-        logger.error(f"Error writing to results file: {e}")
+    # Save the result to RESULTS_FILE and the results database off the event loop
+    result = 'win' if bot_won else 'loss'
+    game = {
+        'won': bot_won, 'word_length': word_length, 'errors': your_score, 'total_time': game_total_time,
+        'turns': game_num_turns, 'word_added': word_added == 'yes', 'players': len(data['players']), 'finished_at': time.time()
+    }
+    await asyncio.to_thread(save_result, f"{result},{word_length},{your_score},{game_total_time},{game_num_turns},{word_added}\n", game)
+    phase_metrics.record('persistence', time.perf_counter() - persistence_start, word_length)
 
     # Update global totals
     total_time += game_total_time
     total_turns += game_num_turns
 
+    global games_since_snapshot
+    games_since_snapshot += 1
+    if games_since_snapshot >= STATS_SNAPSHOT_INTERVAL:
+        games_since_snapshot = 0
+        await asyncio.to_thread(results_checkpoint.update)
+
     # Compute win percentage
     win_percentage = (total_wins / total_games) * 100
     logger.info(f"Win percentage: {win_percentage:.2f}% ({total_wins}/{total_games})")
@@ -191,16 +371,14 @@ def handle_result(data: Dict[str, Any]) -> None:
     # Adjust weights based on game result
     handle_game_result(bot_won)
 
-    # Reset turn_times for the next game
-    turn_times = []
-
-async def handle_round(data: Dict[str, Any]) -> str:
+async def handle_round(session: BotSession, data: Dict[str, Any]) -> str:
     if IsFarmBot:
         logger.debug("FarmBot is enabled. Skipping round.")
         return ''
 
-    global incorrect_letters, turn_times
-    start_time = time.time()
+    sample_round()
+    start_time = time.perf_counter()
+    word_length = len(data.get('word', '')) or None
     try:
         round_data: RoundDataDTO = DataDTOFactory.create_dto(
             data['type'],
@@ -210,13 +388,18 @@ async def handle_round(data: Dict[str, Any]) -> str:
             data['word'],
             data['guessed']
         )
-        logger.info(f"Round data received: Word state '{round_data.word}', Guessed letters {round_data.guessed}")
+        phase_metrics.record('dto', time.perf_counter() - start_time, word_length)
+        round_logger.info("[%s] Round data received: Word state '%s', Guessed letters %s", session.name, round_data.word, round_data.guessed)
 
         # Update incorrect letters
         current_word_letters = set(round_data.word.replace('_', ''))
-        incorrect_letters = set(letter for letter in round_data.guessed if letter not in current_word_letters)
+        session.incorrect_letters = set(letter for letter in round_data.guessed if letter not in current_word_letters)
 
-        next_letter = await get_next_letter(round_data.word, round_data.guessed, incorrect_letters)
+        next_letter = await get_next_letter(round_data.word, round_data.guessed, session.incorrect_letters, session.candidates, TURN_DEADLINE)
+        # Only the phases the solver ran are recorded, none on a decision cache hit. Copied,
+        # as the solver thread may still be writing them after a missed deadline.
+        for phase, duration in list(session.candidates.phase_times.items()):
+            phase_metrics.record(phase, duration, word_length)
         if next_letter is None:
             logger.error("No valid letters left to guess.")
             # Select a random unguessed letter to avoid invalid move
@@ -230,44 +413,74 @@ async def handle_round(data: Dict[str, Any]) -> str:
                 next_letter = 'E'
                 logger.warning("All letters guessed. Defaulting to letter 'E'.")
 
-        logger.info(f"Guessing the next letter: '{next_letter}'")
+        round_logger.info("[%s] Guessing the next letter: '%s'", session.name, next_letter)
         return next_letter
     except Exception as e:
         logger.error(f"Error in handle_round: {e}")
         # Return a default letter to avoid making an invalid move
         return 'E'
     finally:
-        end_time = time.time()
-        turn_times.append(end_time - start_time)
+        turn_time = time.perf_counter() - start_time
+        session.turn_times.append(turn_time)
+        phase_metrics.record('turn', turn_time, word_length)
+        if round_profiler.remaining:
+            round_profiler.round_finished()
 
 handlers = {
     'INIT': handle_init,
     'RESULT': handle_result
 }
 
-@sio.event
-async def data(data: Dict[str, Any]) -> Any:
-    """Dispatches incoming data to the appropriate handler."""
-    message_type = data.get('type')
-    if message_type == 'ROUND':
-        return await handle_round(data)
-    elif message_type in handlers:
-        handler = handlers[message_type]
-        handler(data)
-    else:
-        logger.error(f"Unknown message type received: {data}")
-
-@sio.event
-async def disconnect() -> None:
-    """Handles the disconnection event."""
-    logger.error('Disconnected from the server!')
+def save_startup_times() -> None:
+    """Logs the startup phases and appends them to STARTUP_FILE to track cold-start regressions."""
+    phases = ['import', 'load', 'compile', 'connect']
+    logger.info(f"Startup took {sum(startup_times.values()):.3f} seconds: "
+                + ", ".join(f"{phase} {startup_times[phase]:.3f}" for phase in phases))
+    try:
+        with open(STARTUP_FILE, 'a', encoding='utf-8') as f:
+            # Format: 'timestamp,import,load,compile,connect'
+            f.write(f"{int(time.time())}," + ",".join(f"{startup_times[phase]:.4f}" for phase in phases) + "\n")
+    except Exception as e:
+        logger.error(f"Error writing to startup file: {e}")
 
 async def main() -> None:
-    """Main function to start the client."""
-    await sio.connect(SERVER_URL, transports=['websocket'])
-    await sio.wait()
+    """Main function to start one client per configured secret."""
+    secrets = get_secrets()
+    if not secrets:
+        logger.error("No secret configured. Set BOT_SECRET or SECRET in config.json.")
+        return
+
+    global results_store
+    try:
+        results_store = ResultsStore(RESULTS_DB_FILE, results_file=RESULTS_FILE)
+    except Exception as e:
+        logger.error(f"Error opening results database, results are only written to {RESULTS_FILE}: {e}")
+
+    load_start = time.perf_counter()
+    initialize()
+    startup_times['load'] = time.perf_counter() - load_start
+
+    # Compile or load the cached kernels before the first round can arrive
+    compile_start = time.perf_counter()
+    set_thread_count()
+    warm_up()
+    startup_times['compile'] = time.perf_counter() - compile_start
+
+    await start_metrics_server(METRICS_HOST, METRICS_PORT, round_profiler)
+    # kill -USR1 <pid> profiles the next PROFILE_ROUNDS rounds
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, round_profiler.start_soon, PROFILE_ROUNDS)
+
+    sessions = [BotSession(f"bot{i}", secret) for i, secret in enumerate(secrets)]
+    logger.info(f"Starting {len(sessions)} bot identities.")
+    connect_start = time.perf_counter()
+    await asyncio.gather(*(session.start() for session in sessions))
+    startup_times['connect'] = time.perf_counter() - connect_start
+    save_startup_times()
+
+    await asyncio.gather(*(session.sio.wait() for session in sessions))
 
 if __name__ == '__main__':
+    setup_logging()
     # Load previous results
     load_results()
     try:
@@ -0,0 +1,130 @@
+# In-process latency histograms of the turn phases and the local endpoint that serves them.
+# Phases are recorded per word length on the event loop, the endpoint reports
+# p50/p95/p99 as JSON on /metrics.json and as Prometheus summaries on /metrics.
+# POST /profile?rounds=N on the same endpoint starts a profile of the next N rounds.
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+import math
+from aiohttp import web
+from config import logger, PROFILE_ROUNDS
+from profiling import RoundProfiler
+
+QUANTILES = (50, 95, 99)
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets, four per power of two from 1 µs to about 18 minutes.
+    Percentiles are reported as the upper bound of their bucket, at most 19% above the exact value.
+    """
+    BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(121)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(percent / 100 * self.count))
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        summary = {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0, 'max': self.max}
+        for quantile in QUANTILES:
+            summary[f"p{quantile}"] = self.percentile(quantile)
+        return summary
+
+class PhaseMetrics:
+    """
+    Histograms per (phase, word length), plus one per phase over all lengths.
+    Only used from the event loop thread, so it needs no locking.
+    """
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Optional[int]], Histogram] = {}
+
+    def record(self, phase: str, seconds: float, word_length: Optional[int] = None) -> None:
+        keys = [(phase, None)] if word_length is None else [(phase, None), (phase, word_length)]
+        for key in keys:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(seconds)
+
+    def to_json(self) -> dict:
+        phases = {}
+        for (phase, word_length), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+            entry = phases.setdefault(phase, {'all': {}, 'lengths': {}})
+            if word_length is None:
+                entry['all'] = histogram.summary()
+            else:
+                entry['lengths'][str(word_length)] = histogram.summary()
+        return {'unit': 'seconds', 'phases': phases}
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP bot_phase_seconds Duration of the turn phases per word length.",
+            "# TYPE bot_phase_seconds summary",
+        ]
+        for (phase, word_length), histogram in sorted(self.histograms.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+            labels = f'phase="{phase}",length="{word_length if word_length is not None else "all"}"'
+            for quantile in QUANTILES:
+                lines.append(f'bot_phase_seconds{{{labels},quantile="{quantile / 100}"}} {histogram.percentile(quantile):.9f}')
+            lines.append(f"bot_phase_seconds_sum{{{labels}}} {histogram.sum:.9f}")
+            lines.append(f"bot_phase_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+# Phase latencies of this process
+phase_metrics = PhaseMetrics()
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=phase_metrics.to_prometheus(), content_type='text/plain', charset='utf-8')
+
+async def handle_metrics_json(request: web.Request) -> web.Response:
+    return web.json_response(phase_metrics.to_json())
+
+def profile_handler(profiler: RoundProfiler):
+    async def handle_profile(request: web.Request) -> web.Response:
+        try:
+            rounds = int(request.query.get('rounds', PROFILE_ROUNDS))
+        except ValueError:
+            return web.json_response({'error': 'rounds must be an integer'}, status=400)
+        if not await profiler.start(rounds):
+            return web.json_response({'error': 'A profile is already running or rounds is not positive'}, status=409)
+        return web.json_response({'rounds': rounds, 'output_dir': profiler.output_dir}, status=202)
+    return handle_profile
+
+async def start_metrics_server(host: str, port: int, profiler: Optional[RoundProfiler] = None) -> Optional[web.AppRunner]:
+    """
+    Serves /metrics and /metrics.json on host:port, and /profile if a profiler is given.
+    Returns the runner, or None if the port is 0 or cannot be bound, as the bot plays without it.
+    """
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    app.router.add_get('/metrics.json', handle_metrics_json)
+    if profiler is not None:
+        app.router.add_post('/profile', profile_handler(profiler))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Could not serve metrics on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
@@ -1,8 +1,13 @@
+import os
 import pickle
 import unicodedata
+from typing import Optional, Tuple
+import numpy as np
 from collections import Counter
-from numba import njit
-from config import logger, SINGLE_LETTER_FREQ_FILE, PAIR_LETTER_FREQ_FILE, OVERALL_LETTER_FREQ_FILE, CLEAN_WORDLIST_FILE, CLEAN_WORDLIST_FILE_E, CLEAN_WORDLIST_FILE_NE, WORD_LIST_FILE
+from config import setup_logging, logger, SINGLE_LETTER_FREQ_FILE, PAIR_LETTER_FREQ_FILE, OVERALL_LETTER_FREQ_FILE, CLEAN_WORDS_FILE, CLEAN_WORD_OFFSETS_FILE, CLEAN_WORD_BITSETS_FILE, CLEAN_WORD_MASKS_FILE, CLEAN_WORD_DELTA_FILE, OPENING_BOOK_FILE, OPENING_BOOK_DEPTH, SCORING_MODE, WORD_LIST_FILE, WORD_DELTA_FILE
+
+# Branches of the opening book with fewer candidates are cheap to solve live and are left out
+OPENING_BOOK_MIN_WORDS = 20
 
 def remove_accents(input_str: str) -> str:
     """
@@ -12,6 +17,20 @@ def remove_accents(input_str: str) -> str:
     nfkd_form = unicodedata.normalize('NFKD', input_str)
     return ''.join([c for c in nfkd_form if not unicodedata.combining(c)])
 
+def normalize_word(word: str) -> Optional[str]:
+    """
+    Normalizes a word the way the clean wordlist stores it: uppercase, German umlauts and 'ß'
+    spelled out and accents removed. Returns None if the word then contains characters
+    other than A-Z or is shorter than 5 letters.
+    """
+    word = word.strip().upper()
+    word = word.replace('Ä', 'AE').replace('Ö', 'OE').replace('Ü', 'UE').replace('ß', 'SS')
+    word = remove_accents(word)
+    # After removing accents, ensure that word contains only A-Z
+    if all('A' <= c <= 'Z' for c in word) and len(word) >= 5:
+        return word
+    return None
+
 def load_word_list(file_path: str) -> list:
     """
     Loads and processes the word list from the specified file path.
@@ -24,12 +43,9 @@ def load_word_list(file_path: str) -> list:
         processed_words = set()
 
         for word in words:
-            word = word.strip().upper()
-            word = word.replace('Ä', 'AE').replace('Ö', 'OE').replace('Ü', 'UE').replace('ß', 'SS')
-            word = remove_accents(word)
-            # After removing accents, ensure that word contains only A-Z
-            if all('A' <= c <= 'Z' for c in word) and len(word) >= 5:
-                processed_words.add(word)
+            normalized = normalize_word(word)
+            if normalized is not None:
+                processed_words.add(normalized)
             else:
                 logger.debug(f"Skipping word with non-standard characters: {word}")
         return list(processed_words)
@@ -116,67 +132,195 @@ def save_frequencies(single_letter_freq: dict, pair_letter_freq: dict, overall_l
 
 def save_clean_wordlist(word_list: list) -> None:
     """
-    Saves the cleaned word list to a pickle file for efficient loading.
+    Saves the cleaned word list as the single memory-mappable word store and its opening book.
+    Every word is stored once, words with 'E' ahead of words without it.
     """
     try:
-        save_clean_wordlist_e(word_list)
-        save_clean_wordlist_ne(word_list)
-        logger.debug("Saving all words")
-        with open(CLEAN_WORDLIST_FILE, 'wb') as f:
-            pickle.dump(word_list, f)
-        logger.info("Clean wordlist with just e saved successfully.")
+        index = build_length_index(word_list)
+        save_word_matrix(index)
+        save_opening_book(index)
     except Exception as e:
         logger.error(f"Error saving clean wordlist: {e}")
 
-def save_clean_wordlist_e(word_list: list) -> None:
+def build_length_index(word_list: list) -> dict:
     """
-    Saves the cleaned word list to a pickle file for efficient loading.
+    Buckets the words by length, split into words with and without 'E'.
+    Returns a dictionary of the form {'e': {length: [words]}, 'ne': {length: [words]}}.
     """
+    index = {'e': {}, 'ne': {}}
+    for word in word_list:
+        key = 'e' if 'E' in word.upper() else 'ne'
+        index[key].setdefault(len(word), []).append(word)
+    for buckets in index.values():
+        for bucket in buckets.values():
+            bucket.sort()
+    return index
 
-    @njit
-    def get_list_words_with_e(word_list: list) -> list:
-        new_list = []
-        for word in word_list:
-            if "E" in word.upper():
-                new_list.append(word)
-        return new_list
-    
-    get_list_words_with_e(word_list[:100])
-    logger.debug("Saving words with e")
+def build_position_bitsets(words: np.ndarray) -> np.ndarray:
+    """
+    Builds the positional letter bitsets for a uint8 matrix of equal length words.
+    Returns a uint8 array of shape (length, 26, ceil(len(words) / 8)) where bit i
+    of [position, letter] is set if words[i] has that letter at that position.
+    """
+    matches = (words - ord('A'))[:, :, None] == np.arange(26, dtype=np.uint8)
+    return np.ascontiguousarray(np.packbits(matches, axis=0).transpose(1, 2, 0))
+
+def extend_position_bitsets(bitsets: np.ndarray, count: int, words: np.ndarray) -> np.ndarray:
+    """
+    Returns the positional letter bitsets of a bucket of count words with words appended,
+    copying the existing bytes and only setting the bits of the new rows.
+    """
+    total = count + len(words)
+    extended = np.zeros((words.shape[1], 26, (total + 7) // 8), dtype=np.uint8)
+    extended[:, :, :bitsets.shape[2]] = bitsets
+    rows = np.arange(count, total)
+    bits = (0x80 >> (rows & 7)).astype(np.uint8)
+    np.bitwise_or.at(extended, (np.arange(words.shape[1])[None, :], words - ord('A'), (rows >> 3)[:, None]), bits[:, None])
+    return extended
+
+def build_letter_masks(words: np.ndarray) -> np.ndarray:
+    """
+    Builds the letter-presence mask of every word in a uint8 matrix of equal length words.
+    Bit k of a mask is set if the word contains the k-th letter of the alphabet.
+    """
+    bits = np.left_shift(np.uint32(1), (words - ord('A')).astype(np.uint32))
+    return np.bitwise_or.reduce(bits, axis=1).astype(np.uint32)
+
+def save_index_file(path: str, array: np.ndarray) -> None:
+    """Saves an index file under a temporary name and renames it, so processes mapping the old file keep it intact."""
+    directory, name = os.path.split(path)
+    temp_file = os.path.join(directory, f".{os.getpid()}.{name}")
+    np.save(temp_file, array)
+    os.replace(temp_file, path)
+
+def save_word_matrix(index: dict, index_dir: Optional[str] = None, delta_position: Optional[Tuple[int, int]] = None) -> bool:
+    """
+    Saves the per-length buckets as fixed-width uint8 matrices of ASCII letters,
+    concatenated into one .npy file so the bot can memory-map it.
+    The letter masks and positional letter bitsets of every bucket are saved the same way.
+    The offsets file has one row (has_e, length, count, word_start, mask_start, bitset_start)
+    per bucket, where the starts are element offsets into the flat files.
+    The files are written to index_dir, the directory of CLEAN_WORDS_FILE by default.
+    delta_position is the (inode, offset) of WORD_DELTA_FILE up to which the learned words are
+    in the index, saved to the delta file after the index. Without it the delta file is removed.
+    Returns whether the files were written.
+    """
+    offsets = []
+    word_chunks = []
+    mask_chunks = []
+    bitset_chunks = []
+    word_start = 0
+    mask_start = 0
+    bitset_start = 0
+    for has_e, key in ((1, 'e'), (0, 'ne')):
+        for length, words in sorted(index[key].items()):
+            matrix = np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape(len(words), length)
+            bitsets = build_position_bitsets(matrix)
+            offsets.append((has_e, length, len(words), word_start, mask_start, bitset_start))
+            word_chunks.append(matrix.ravel())
+            mask_chunks.append(build_letter_masks(matrix))
+            bitset_chunks.append(bitsets.ravel())
+            word_start += matrix.size
+            mask_start += len(words)
+            bitset_start += bitsets.size
+    logger.debug("Saving word matrix")
 
     try:
-        with open(CLEAN_WORDLIST_FILE_E, 'wb') as f:
-            pickle.dump(get_list_words_with_e(word_list), f)
-        logger.info("Clean wordlist saved successfully.")
+        words_file, masks_file, bitsets_file, offsets_file, delta_file = (
+            os.path.join(index_dir, os.path.basename(file)) if index_dir else file
+            for file in (CLEAN_WORDS_FILE, CLEAN_WORD_MASKS_FILE, CLEAN_WORD_BITSETS_FILE, CLEAN_WORD_OFFSETS_FILE, CLEAN_WORD_DELTA_FILE)
+        )
+        # Removed first, so a failed write leaves the bot replaying all learned words rather than skipping some
+        if os.path.exists(delta_file):
+            os.remove(delta_file)
+        save_index_file(words_file, np.concatenate(word_chunks) if word_chunks else np.empty(0, dtype=np.uint8))
+        save_index_file(masks_file, np.concatenate(mask_chunks) if mask_chunks else np.empty(0, dtype=np.uint32))
+        save_index_file(bitsets_file, np.concatenate(bitset_chunks) if bitset_chunks else np.empty(0, dtype=np.uint8))
+        # Written last, the bot reloads when its modification time changes
+        save_index_file(offsets_file, np.array(offsets, dtype=np.int64).reshape(-1, 6))
+        if delta_position is not None:
+            save_index_file(delta_file, np.array(delta_position, dtype=np.int64))
+        logger.info("Word matrix saved successfully.")
+        return True
     except Exception as e:
-        logger.error(f"Error saving clean wordlist: {e}")
+        logger.error(f"Error saving word matrix: {e}")
+        return False
+
+def partition_by_letter(words: np.ndarray, rows: np.ndarray, word_state: str, letter: str):
+    """
+    Splits the candidate rows by the positions the letter would reveal.
+    Yields the resulting word_state and the rows of every partition.
+    """
+    hits = words[rows] == ord(letter)
+    _, inverse = np.unique(np.packbits(hits, axis=1), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for group in range(inverse.max() + 1 if len(rows) else 0):
+        members = np.flatnonzero(inverse == group)
+        revealed = hits[members[0]]
+        child_state = ''.join(letter if revealed[i] else c for i, c in enumerate(word_state))
+        yield child_state, rows[members]
+
+def extend_opening_book(entries: dict, words: np.ndarray, masks: np.ndarray, rows: np.ndarray,
+                        word_state: str, incorrect_letters: set, guessed_letters: set, depth: int, mode: str) -> None:
+    """
+    Adds the decision for word_state to the opening book and recurses into
+    every outcome of that decision until depth decisions are stored.
+    """
+    # Imported here, so tools that only need load_word_list do not load Numba
+    from solver import filter_and_count, choose_letter
+    if depth == 0 or len(rows) < OPENING_BOOK_MIN_WORDS:
+        return
+    indices, letter_frequencies = filter_and_count(words, masks, rows, word_state, incorrect_letters, guessed_letters)
+    letter = choose_letter(words[indices], letter_frequencies, mode)
+    entries[(word_state, ''.join(sorted(guessed_letters)))] = letter
 
-def save_clean_wordlist_ne(word_list: list) -> None:
+    for child_state, child_rows in partition_by_letter(words, indices, word_state, letter):
+        child_incorrect = incorrect_letters | {letter} if child_state == word_state else incorrect_letters
+        extend_opening_book(entries, words, masks, child_rows, child_state, child_incorrect,
+                            guessed_letters | {letter}, depth - 1, mode)
+
+def build_opening_book(index: dict, depth: int = OPENING_BOOK_DEPTH, mode: str = SCORING_MODE) -> dict:
     """
-    Saves the cleaned word list to a pickle file for efficient loading.
+    Builds the opening book: the decisions that follow the forced 'E' guess,
+    per word length and 'E' reveal pattern, down to depth decisions.
+    Entries map (word_state, sorted guessed letters) to the next letter.
     """
-    
-    @njit
-    def get_list_words_without_e(word_list: list) -> list:
-        new_list = []
-        for word in word_list:
-            if "E" not in word.upper():
-                new_list.append(word)
-        return new_list
-    
-    get_list_words_without_e(word_list[:100])
-    logger.debug("Saving words without e")
+    entries = {}
+    for key, buckets in index.items():
+        for length, words in buckets.items():
+            matrix = np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape(len(words), length)
+            masks = build_letter_masks(matrix)
+            rows = np.arange(len(words))
+            if key == 'ne':
+                extend_opening_book(entries, matrix, masks, rows, '_' * length, {'E'}, {'E'}, depth, mode)
+                continue
+            for word_state, e_rows in partition_by_letter(matrix, rows, '_' * length, 'E'):
+                extend_opening_book(entries, matrix, masks, e_rows, word_state, set(), {'E'}, depth, mode)
+    return {'mode': mode, 'depth': depth, 'entries': entries}
+
+def save_opening_book(index: dict, book_file: str = OPENING_BOOK_FILE) -> None:
+    """
+    Saves the opening book to a pickle file next to the word matrix.
+    """
+    book = build_opening_book(index)
+    logger.debug("Saving opening book")
 
     try:
-        with open(CLEAN_WORDLIST_FILE_NE, 'wb') as f:
-            pickle.dump(get_list_words_without_e(word_list), f)
-        logger.info("Clean wordlist saved successfully.")
+        with open(book_file, 'wb') as f:
+            pickle.dump(book, f)
+        logger.info(f"Opening book with {len(book['entries'])} entries saved successfully.")
     except Exception as e:
-        logger.error(f"Error saving clean wordlist: {e}")
+        logger.error(f"Error saving opening book: {e}")
 
 if __name__ == '__main__':
+    from solver import set_thread_count
+    setup_logging()
+    set_thread_count()
     logger.info("Starting pre-processing of wordlist.")
     word_list = load_word_list(WORD_LIST_FILE)
+    # The words the bots learned during play are kept in DATA_DIR, not in the word list
+    if os.path.exists(WORD_DELTA_FILE):
+        word_list = list(set(word_list) | set(load_word_list(WORD_DELTA_FILE)))
     logger.info(f"Total processed words: {len(word_list)}")
     single_letter_freq, pair_letter_freq, overall_letter_freq = precompute_frequencies(word_list)
     save_frequencies(single_letter_freq, pair_letter_freq, overall_letter_freq)
@@ -0,0 +1,89 @@
+# On-demand cProfile of a live bot for the next N rounds.
+# Started with SIGUSR1 or POST /profile on the metrics endpoint, the profile of the
+# event loop and the solver thread is written to PROFILE_DIR once the rounds are played.
+from concurrent.futures import Executor
+from typing import Optional
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import time
+from config import logger
+
+class RoundProfiler:
+    """
+    Profiles the event loop thread and the single solver thread for a number of rounds.
+    Disabled, it costs handle_round one integer check per round.
+    """
+    def __init__(self, executor: Executor, output_dir: str):
+        self.executor = executor
+        self.output_dir = output_dir
+        self.remaining = 0
+        self.loop_profile: Optional[cProfile.Profile] = None
+        self.solver_profile: Optional[cProfile.Profile] = None
+        self.start_task: Optional[asyncio.Task] = None
+        self.stop_task: Optional[asyncio.Task] = None
+
+    async def start(self, rounds: int) -> bool:
+        """Profiles the next rounds rounds. Returns False if a profile is already running."""
+        if self.remaining or self.loop_profile is not None or rounds <= 0:
+            return False
+        self.loop_profile = cProfile.Profile()
+        try:
+            self.loop_profile.enable()
+        except ValueError as e:
+            logger.error(f"Cannot start profiling: {e}")
+            self.loop_profile = None
+            return False
+        self.solver_profile = cProfile.Profile()
+        try:
+            # cProfile only sees the thread it is enabled on, so the solver thread gets its own
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.solver_profile.enable)
+        except ValueError:
+            # Python 3.12+ allows a single active profiler, the loop thread's then covers all threads
+            self.solver_profile = None
+        self.remaining = rounds
+        logger.info(f"Profiling the next {rounds} rounds.")
+        return True
+
+    def start_soon(self, rounds: int) -> None:
+        """Starts a profile from a signal handler, which cannot await start."""
+        self.start_task = asyncio.ensure_future(self.start(rounds))
+
+    def round_finished(self) -> None:
+        """Counts a profiled round and stops the profile after the last one."""
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.stop_task = asyncio.ensure_future(self.stop())
+
+    async def stop(self) -> None:
+        self.loop_profile.disable()
+        if self.solver_profile is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.solver_profile.disable)
+        try:
+            path = await asyncio.to_thread(self.save)
+            logger.info(f"Saved the round profile to {path}")
+        except Exception as e:
+            logger.error(f"Error saving the round profile: {e}")
+        finally:
+            self.loop_profile = None
+            self.solver_profile = None
+
+    def save(self) -> str:
+        """
+        Writes the merged profile as profile-<timestamp>-<pid>.prof for pstats or snakeviz,
+        and the 50 most expensive functions by cumulative time as profile-<timestamp>-<pid>.txt.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{int(time.time())}-{os.getpid()}")
+        stats = pstats.Stats(self.loop_profile)
+        if self.solver_profile is not None:
+            stats.add(self.solver_profile)
+        stats.dump_stats(f"{path}.prof")
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(50)
+        with open(f"{path}.txt", 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        return f"{path}.prof"
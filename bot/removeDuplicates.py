@@ -1,5 +1,5 @@
 import os
-from config import logger, WORD_LIST_FILE
+from config import setup_logging, logger, WORD_LIST_FILE
 
 def remove_duplicates(file_path):
     if not os.path.exists(file_path):
@@ -35,4 +35,5 @@ def remove_duplicates(file_path):
     duplicates_removed = total_words - len(unique_words)
     logger.info(f"Removed {duplicates_removed} duplicates and words shorter than 5 letters from {file_path}")
 
+setup_logging()
 remove_duplicates(WORD_LIST_FILE)
\ No newline at end of file
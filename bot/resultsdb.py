@@ -0,0 +1,237 @@
+# SQLite store of the game results, shared by the bot and the api.
+# One row per game plus rollups per word length, per number of players and per hour, updated in the same
+# transaction as the game row, so the dashboard queries never scan the games.
+# Does not import config, as the api image only ships webapp.py and this module.
+#
+# Import the results of the games played before the database existed, once:
+#   python resultsdb.py [results.txt]
+from typing import Dict, List, Optional, Tuple
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL,
+    won INTEGER NOT NULL,
+    word_length INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    turns INTEGER NOT NULL,
+    word_added INTEGER NOT NULL,
+    players INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_finished_at ON games (finished_at);
+CREATE TABLE IF NOT EXISTS length_rollup (
+    word_length INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    turns INTEGER NOT NULL,
+    words_added INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players_rollup (
+    players INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    turns INTEGER NOT NULL,
+    words_added INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hour_rollup (
+    hour INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    turns INTEGER NOT NULL,
+    words_added INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} ({key}, games, wins, errors, total_time, turns, words_added) VALUES (?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT ({key}) DO UPDATE SET
+    games = games + 1, wins = wins + excluded.wins, errors = errors + excluded.errors,
+    total_time = total_time + excluded.total_time, turns = turns + excluded.turns,
+    words_added = words_added + excluded.words_added
+"""
+
+AGGREGATES = "SUM(games), SUM(wins), SUM(errors), SUM(total_time), SUM(turns), SUM(words_added)"
+
+def aggregate_dict(row) -> dict:
+    games, wins, errors, total_time, turns, words_added = (value or 0 for value in row)
+    return {
+        'games': games,
+        'wins': wins,
+        'win_percentage': wins / games * 100 if games else 0,
+        'avg_errors': errors / games if games else 0,
+        'avg_time_per_turn': total_time / turns if turns else 0,
+        'words_added': words_added,
+    }
+
+class ResultsStore:
+    """
+    Game results in an SQLite database in WAL mode, so that the api reads while the bot writes.
+    The connection is shared by the threads the bot writes from, guarded by a lock.
+    Given the results file, a new database records how far the file went, the end of the import.
+    """
+    def __init__(self, path: str, readonly: bool = False, results_file: Optional[str] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        if readonly:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            # Switching to WAL does not wait for the busy timeout, so bots opening a new
+            # database at the same time retry. The mode is stored in the file, later opens skip it.
+            for attempt in range(50):
+                try:
+                    if self.connection.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+                        self.connection.execute("PRAGMA journal_mode=WAL")
+                    break
+                except sqlite3.OperationalError:
+                    if attempt == 49:
+                        raise
+                    time.sleep(0.1)
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+            if results_file is not None:
+                self.mark_results_position(results_file)
+
+    def mark_results_position(self, results_file: str) -> None:
+        """
+        Records the inode and size of the results file unless the database already holds games.
+        The lines before that size were written without the database and are the ones to import.
+        """
+        try:
+            stat = os.stat(results_file)
+            inode, offset = str(stat.st_ino), stat.st_size
+        except FileNotFoundError:
+            inode, offset = None, 0
+        with self.lock, self.connection:
+            if self.connection.execute("SELECT 1 FROM games LIMIT 1").fetchone() is not None:
+                return
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('results_inode', ?)", (inode,))
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('results_offset', ?)", (offset,))
+
+    def meta(self, key: str):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def results_position(self) -> Optional[Tuple[Optional[str], int]]:
+        """The (inode, size) of the results file when the database was created, None if it is unknown."""
+        offset = self.meta('results_offset')
+        return (self.meta('results_inode'), offset) if offset is not None else None
+
+    def record_game(self, won: bool, word_length: int, errors: int, total_time: float, turns: int,
+                    word_added: bool, players: Optional[int] = None, finished_at: Optional[float] = None) -> None:
+        """Inserts a game and adds it to the rollups in one transaction."""
+        with self.lock, self.connection:
+            self.add_game(won, word_length, errors, total_time, turns, word_added, players, finished_at)
+
+    def add_game(self, won, word_length, errors, total_time, turns, word_added, players, finished_at) -> None:
+        """Inserts a game and adds it to the rollups within the caller's transaction."""
+        self.connection.execute(
+            "INSERT INTO games (finished_at, won, word_length, errors, total_time, turns, word_added, players) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (finished_at, int(won), word_length, errors, total_time, turns, int(word_added), players)
+        )
+        values = (int(won), errors, total_time, turns, int(word_added))
+        self.connection.execute(ROLLUP_UPSERT.format(table='length_rollup', key='word_length'), (word_length,) + values)
+        # Imported games have neither a player count nor a timestamp
+        if players is not None:
+            self.connection.execute(ROLLUP_UPSERT.format(table='players_rollup', key='players'), (players,) + values)
+        if finished_at is not None:
+            self.connection.execute(ROLLUP_UPSERT.format(table='hour_rollup', key='hour'), (int(finished_at // 3600),) + values)
+
+    def import_results(self, results_file: str, end_offset: Optional[int] = None) -> int:
+        """
+        Imports the lines of a results.txt file ('win,word_length,error_count,total_time,num_turns,word_added')
+        before end_offset, all of them by default, in one transaction and marks the database as imported.
+        The file has no timestamps or player counts, so these stay empty. Returns the number of imported games.
+        """
+        imported = 0
+        offset = 0
+        with open(results_file, 'rb') as f, self.lock, self.connection:
+            for raw_line in f:
+                offset += len(raw_line)
+                if end_offset is not None and offset > end_offset:
+                    break
+                parts = raw_line.decode('utf-8', errors='replace').strip().split(',')
+                if len(parts) != 6:
+                    continue
+                result, word_length_str, error_count_str, total_time_str, num_turns_str, word_added = parts
+                try:
+                    self.add_game(result.lower() == 'win', int(word_length_str), int(error_count_str),
+                                  float(total_time_str), int(num_turns_str), word_added.lower() == 'yes', None, None)
+                except ValueError:
+                    continue
+                imported += 1
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('results_imported', 1)")
+        return imported
+
+    def game_count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COALESCE(SUM(games), 0) FROM length_rollup").fetchone()[0]
+
+    def totals(self) -> dict:
+        with self.lock:
+            return aggregate_dict(self.connection.execute(f"SELECT {AGGREGATES} FROM length_rollup").fetchone())
+
+    def lengths(self) -> Dict[int, dict]:
+        with self.lock:
+            rows = self.connection.execute("SELECT word_length, games, wins, errors, total_time, turns, words_added FROM length_rollup ORDER BY word_length").fetchall()
+        return {row[0]: aggregate_dict(row[1:]) for row in rows}
+
+    def recent(self, hours: int) -> dict:
+        """Aggregates of the games finished in the last hours, from whole hour buckets."""
+        first_hour = int(time.time() // 3600) - hours + 1
+        with self.lock:
+            return aggregate_dict(self.connection.execute(f"SELECT {AGGREGATES} FROM hour_rollup WHERE hour >= ?", (first_hour,)).fetchone())
+
+    def hourly(self, hours: int) -> List[dict]:
+        first_hour = int(time.time() // 3600) - hours + 1
+        with self.lock:
+            rows = self.connection.execute("SELECT hour, games, wins, errors, total_time, turns, words_added FROM hour_rollup WHERE hour >= ? ORDER BY hour", (first_hour,)).fetchall()
+        return [dict(aggregate_dict(row[1:]), hour=row[0] * 3600) for row in rows]
+
+    def by_players(self) -> Dict[int, dict]:
+        """Aggregates per number of players in the game, the bot included."""
+        with self.lock:
+            rows = self.connection.execute("SELECT players, games, wins, errors, total_time, turns, words_added FROM players_rollup ORDER BY players").fetchall()
+        return {row[0]: aggregate_dict(row[1:]) for row in rows}
+
+    def close(self) -> None:
+        self.connection.close()
+
+if __name__ == '__main__':
+    import sys
+    from config import setup_logging, logger, RESULTS_FILE, RESULTS_DB_FILE
+    setup_logging()
+    results_file = sys.argv[1] if len(sys.argv) > 1 else RESULTS_FILE
+    store = ResultsStore(RESULTS_DB_FILE, results_file=results_file)
+    if store.meta('results_imported'):
+        logger.error(f"{results_file} was already imported into {RESULTS_DB_FILE}.")
+        sys.exit(1)
+    # The games written by the bot are in results.txt as well, only the lines from before the database are imported
+    position = store.results_position()
+    if position is None:
+        logger.error(f"{RESULTS_DB_FILE} holds {store.game_count()} games and does not know which lines of {results_file} they are. Remove it to import {results_file}.")
+        sys.exit(1)
+    inode, end_offset = position
+    if end_offset and inode != str(os.stat(results_file).st_ino):
+        logger.error(f"{results_file} was replaced after {RESULTS_DB_FILE} was created, its lines cannot be matched.")
+        sys.exit(1)
+    start_time = time.time()
+    count = store.import_results(results_file, end_offset)
+    logger.info(f"Imported {count} games from {results_file} into {RESULTS_DB_FILE} in {time.time() - start_time:.2f} seconds.")
+    store.close()
@@ -0,0 +1,192 @@
+# Solver primitives shared by the bot and the offline tools.
+# Everything here works on the uint8 word matrices written by preprocess.py
+# and does not depend on the loaded wordlist or on game state.
+from typing import Dict, Iterable, Set, Tuple
+import logging
+import numba
+from numba import njit, prange
+import numpy as np
+from config import THREADCOUNT
+
+# Suppress Numba debug logs
+numba_logger = logging.getLogger('numba')
+numba_logger.setLevel(logging.WARNING)
+
+def set_thread_count(threads: int = THREADCOUNT) -> None:
+    """
+    Sets the threads used by the parallel Numba kernels, capped at the number of available cores.
+    This starts Numba's thread pool, so it is left to the entry points instead of the import.
+    """
+    numba.set_num_threads(max(1, min(threads, numba.config.NUMBA_NUM_THREADS)))
+
+@njit(parallel=True, cache=True, nogil=True)
+def filter_count_kernel(words, masks, rows, pattern, revealed_bitmask, incorrect_bitmask, guessed_bitmask, num_chunks):
+    """
+    Fused Numba kernel that filters the candidate rows and counts their letters in one pass.
+
+    Parameters:
+    - words (np.ndarray): uint8 word matrix of one length bucket.
+    - masks (np.ndarray): uint32 letter-presence masks of the bucket.
+    - rows (np.ndarray): Row indices of the candidates to check.
+    - pattern (np.ndarray): uint8 ASCII letter per position, 0 for unrevealed positions.
+    - revealed_bitmask (int): Bitmask of revealed letters, which unrevealed positions cannot hold.
+    - incorrect_bitmask (int): Bitmask of letters the word must not contain.
+    - guessed_bitmask (int): Bitmask of guessed letters, which are not counted.
+    - num_chunks (int): Number of chunks the rows are split into for the parallel loop.
+
+    Returns:
+    - np.ndarray: Boolean array marking the rows that still match.
+    - np.ndarray: Array of counts for each letter A-Z over the matching rows.
+    """
+    num_rows = rows.shape[0]
+    word_length = words.shape[1]
+    keep = np.zeros(num_rows, dtype=np.bool_)
+    num_chunks = min(num_rows, num_chunks)
+    chunk_counts = np.zeros((num_chunks, 26), dtype=np.int64)
+
+    for chunk in prange(num_chunks):
+        start = chunk * num_rows // num_chunks
+        end = (chunk + 1) * num_rows // num_chunks
+        for i in range(start, end):
+            row = rows[i]
+            word_bitmask = np.int64(masks[row])
+            if word_bitmask & incorrect_bitmask:
+                continue
+
+            matches = True
+            for j in range(word_length):
+                char = words[row, j]
+                if pattern[j] == 0:
+                    if (revealed_bitmask >> (char - 65)) & 1:
+                        matches = False
+                        break
+                elif char != pattern[j]:
+                    matches = False
+                    break
+            if not matches:
+                continue
+
+            keep[i] = True
+            available_bitmask = word_bitmask & ~guessed_bitmask
+            for k in range(26):
+                if (available_bitmask >> k) & 1:
+                    chunk_counts[chunk, k] += 1
+
+    return keep, chunk_counts.sum(axis=0)
+
+@njit(parallel=True, cache=True, nogil=True)
+def partition_kernel(words, letters):
+    """
+    Numba kernel that partitions the words by the positions each letter would reveal.
+
+    Parameters:
+    - words (np.ndarray): uint8 matrix of the candidate words.
+    - letters (np.ndarray): uint8 ASCII letters to score.
+
+    Returns:
+    - np.ndarray: Expected number of remaining candidates after guessing each letter.
+    - np.ndarray: Entropy in bits of the position pattern revealed by each letter.
+    """
+    num_words, word_length = words.shape
+    expected = np.zeros(letters.shape[0], dtype=np.float64)
+    entropy = np.zeros(letters.shape[0], dtype=np.float64)
+
+    for li in prange(letters.shape[0]):
+        letter = letters[li]
+        # The pattern is the bitmask of positions holding the letter, 0 if it is missing
+        patterns = np.empty(num_words, dtype=np.int64)
+        for i in range(num_words):
+            pattern = 0
+            for j in range(word_length):
+                if words[i, j] == letter:
+                    pattern |= 1 << (j % 63)
+            patterns[i] = pattern
+        patterns.sort()
+
+        sum_squares = 0.0
+        letter_entropy = 0.0
+        run = 1
+        for i in range(1, num_words + 1):
+            if i < num_words and patterns[i] == patterns[i - 1]:
+                run += 1
+            else:
+                p = run / num_words
+                sum_squares += run * run
+                letter_entropy -= p * np.log2(p)
+                run = 1
+        if num_words > 0:
+            expected[li] = sum_squares / num_words
+        entropy[li] = letter_entropy
+
+    return expected, entropy
+
+def select_letter_by_partition(possible_words: np.ndarray, letter_frequencies: Dict[str, int], mode: str) -> str:
+    """
+    Picks the letter with the highest entropy or the lowest expected number of
+    remaining candidates. Only letters contained in at least one candidate are
+    scored, and ties are broken by letter frequency.
+    """
+    letters = [letter for letter, count in letter_frequencies.items() if count > 0]
+    letters_np = np.frombuffer(''.join(letters).encode('ascii'), dtype=np.uint8)
+    expected, entropy = partition_kernel(possible_words, letters_np)
+
+    if mode == 'entropy':
+        scores = {letter: (entropy[i], letter_frequencies[letter]) for i, letter in enumerate(letters)}
+    else:
+        scores = {letter: (-expected[i], letter_frequencies[letter]) for i, letter in enumerate(letters)}
+    return max(scores, key=scores.get)
+
+def letters_to_bitmask(letters: Iterable[str]) -> int:
+    """Converts uppercase letters to a bitmask with bit k set for chr(65 + k)."""
+    bitmask = 0
+    for letter in letters:
+        idx = ord(letter) - ord('A')
+        if 0 <= idx < 26:
+            bitmask |= (1 << idx)
+    return bitmask
+
+def filter_and_count(words: np.ndarray, masks: np.ndarray, rows: np.ndarray, word_state: str,
+                     incorrect_letters: Set[str], guessed_letters: Set[str]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Filters the candidate rows of a length bucket against the word_state and the
+    incorrect letters, and counts the unguessed letters of the remaining words.
+    All letters are expected in uppercase.
+    Returns the matching row indices and the letter frequencies.
+    """
+    if len(rows) and all('A' <= c <= 'Z' for c in word_state.replace('_', '')):
+        pattern = np.frombuffer(word_state.replace('_', '\0').encode('ascii'), dtype=np.uint8)
+        keep, counts = filter_count_kernel(
+            words, masks, rows, pattern,
+            letters_to_bitmask(set(word_state)), letters_to_bitmask(incorrect_letters), letters_to_bitmask(guessed_letters),
+            numba.get_num_threads() * 4
+        )
+        indices = rows[keep]
+    else:
+        indices = np.empty(0, dtype=np.intp)
+        counts = np.zeros(26, dtype=np.int64)
+
+    letter_frequencies = {chr(65 + i): int(count) for i, count in enumerate(counts)}  # 65 is ASCII for 'A'
+    return indices, letter_frequencies
+
+def warm_up() -> None:
+    """
+    Compiles the kernels, or loads them from the on-disk cache, for the argument types
+    the bot passes at runtime, so the first round does not pay for it.
+    The word buckets are read-only views of memory-mapped files, which Numba
+    types differently from writable arrays.
+    """
+    words = np.frombuffer(b'ABCDEFGHIJ', dtype=np.uint8).reshape(2, 5)
+    masks = np.frombuffer(np.array([0x1F, 0x3E0], dtype=np.uint32).tobytes(), dtype=np.uint32)
+    rows = np.flatnonzero(np.ones(2, dtype=np.bool_))
+    indices, letter_frequencies = filter_and_count(words, masks, rows, '_____', set(), {'E'})
+    choose_letter(words[indices], letter_frequencies, 'entropy')
+
+def choose_letter(possible_words: np.ndarray, letter_frequencies: Dict[str, int], mode: str) -> str:
+    """
+    Picks the next letter from the letter frequencies of the possible words.
+    In 'entropy' and 'expected' mode the candidates are partitioned, otherwise
+    the letter contained in the most candidates wins.
+    """
+    if mode in ('entropy', 'expected') and len(possible_words) > 1 and any(letter_frequencies.values()):
+        return select_letter_by_partition(possible_words, letter_frequencies, mode)
+    return max(letter_frequencies, key=letter_frequencies.get)
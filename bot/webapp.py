@@ -1,88 +1,306 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+import json
 import os
+import queue
+import threading
+import time
+import urllib.request
+from resultsdb import ResultsStore
 
 app = Flask(__name__)
 CORS(app)
 
-@app.route('/api/stats', methods=['GET'])
-def get_stats():
-    DATA_DIR = os.getcwd()
-    RESULTS_FILE = os.path.join(DATA_DIR, 'data', 'results.txt')
+# Phase latency endpoint of the bot, see bot/metrics.py
+METRICS_URL = os.environ.get('METRICS_URL', 'http://bot:9100/metrics.json')
 
-    total_games = 0
-    total_wins = 0
-    total_time = 0.0
-    total_turns = 0
-    total_new_words_added = 0
-    error_counts_per_word_length = {}
+RESULTS_FILE = os.path.join(os.getcwd(), 'data', 'results.txt')
+RESULTS_DB_FILE = os.path.join(os.getcwd(), 'data', 'results.db')
 
-    try:
-        with open(RESULTS_FILE, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue  # Skip empty lines
+# Seconds between the checks of RESULTS_FILE for new games while dashboards are streaming
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 1.0))
+# Seconds after which an idle stream sends a comment, so that closed connections are noticed
+STREAM_KEEPALIVE = 15.0
 
-                parts = line.split(',')
-                if len(parts) != 6:
-                    # Optionally handle malformed lines
-                    continue
+class ResultsAggregate:
+    """
+    Running totals of RESULTS_FILE. Each update only parses the lines appended since the
+    last one, and starts over if the file was replaced (new inode) or truncated.
+    The changes are published to the queues of the streaming dashboards.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.reset(None)
 
-                result, word_length_str, error_count_str, total_time_str, num_turns_str, word_added = parts
+    def reset(self, inode):
+        self.inode = inode
+        self.offset = 0
+        self.total_games = 0
+        self.total_wins = 0
+        self.total_time = 0.0
+        self.total_turns = 0
+        self.total_new_words_added = 0
+        self.error_counts_per_word_length = {}
+        self.body = None
 
-                try:
-                    word_length = int(word_length_str)
-                    error_count = int(error_count_str)
-                    game_total_time = float(total_time_str)
-                    num_turns_game = int(num_turns_str)
-                except ValueError:
-                    # Skip lines with invalid numerical values
-                    continue
+    def add_line(self, line):
+        line = line.strip()
+        if not line:
+            return  # Skip empty lines
+
+        parts = line.split(',')
+        if len(parts) != 6:
+            # Optionally handle malformed lines
+            return
+
+        result, word_length_str, error_count_str, total_time_str, num_turns_str, word_added = parts
+
+        try:
+            word_length = int(word_length_str)
+            error_count = int(error_count_str)
+            game_total_time = float(total_time_str)
+            num_turns_game = int(num_turns_str)
+        except ValueError:
+            # Skip lines with invalid numerical values
+            return
+
+        self.total_games += 1
+        if result.lower() == 'win':
+            self.total_wins += 1
+
+        if word_length not in self.error_counts_per_word_length:
+            self.error_counts_per_word_length[word_length] = {'errors': 0, 'games': 0}
+
+        self.error_counts_per_word_length[word_length]['errors'] += error_count
+        self.error_counts_per_word_length[word_length]['games'] += 1
 
-                total_games += 1
-                if result.lower() == 'win':
-                    total_wins += 1
+        self.total_time += game_total_time
+        self.total_turns += num_turns_game
 
-                if word_length not in error_counts_per_word_length:
-                    error_counts_per_word_length[word_length] = {'errors': 0, 'games': 0}
+        if word_added.lower() == 'yes':
+            self.total_new_words_added += 1
 
-                error_counts_per_word_length[word_length]['errors'] += error_count
-                error_counts_per_word_length[word_length]['games'] += 1
+        return {
+            'result': result.lower(),
+            'word_length': word_length,
+            'errors': error_count,
+            'total_time': game_total_time,
+            'turns': num_turns_game,
+            'word_added': word_added.lower() == 'yes'
+        }
+
+    def update(self):
+        """
+        Parses the complete lines appended since the last update, a partially written last line is
+        left for the next one. Returns the JSON body and its ETag, which changes with every new line.
+        Raises FileNotFoundError if the results file does not exist.
+        """
+        with self.lock:
+            stat = os.stat(self.path)
+            replaced = stat.st_ino != self.inode or stat.st_size < self.offset
+            if replaced:
+                self.reset(stat.st_ino)
+            games = []
+            if stat.st_size > self.offset:
+                with open(self.path, 'rb') as file:
+                    file.seek(self.offset)
+                    appended = file.read(stat.st_size - self.offset)
+                complete = appended.rfind(b'\n') + 1
+                if complete:
+                    games = [self.add_line(line) for line in appended[:complete].decode('utf-8', errors='replace').splitlines()]
+                    games = [game for game in games if game is not None]
+                    self.offset += complete
+                    self.body = None
+            if self.body is None:
+                self.body = json.dumps(self.to_dict())
+            if replaced and self.offset:
+                self.publish('snapshot', self.body)
+            elif games:
+                self.publish('delta', json.dumps(self.delta(games)))
+            return self.body, f'"{self.inode}-{self.offset}"'
+
+    def delta(self, games):
+        """The new games, the updated totals and the aggregates of the word lengths they changed."""
+        stats = self.to_dict()
+        del stats['error_counts_per_word_length']
+        lengths = set(game['word_length'] for game in games)
+        return {
+            'stats': stats,
+            'error_counts_per_word_length': {str(k): v for k, v in self.error_counts_per_word_length.items() if k in lengths},
+            'games': games
+        }
+
+    def publish(self, event, data):
+        message = f"event: {event}\ndata: {data}\n\n"
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A dashboard that stopped reading is dropped, its EventSource reconnects with a snapshot.
+                # Its queue is emptied for the closing None, as this runs under the lock and must not block.
+                self.subscribers.discard(subscriber)
+                try:
+                    while True:
+                        subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(None)
 
-                total_time += game_total_time
-                total_turns += num_turns_game
+    def subscribe(self):
+        """
+        Returns a queue of the server-sent event messages, starting with a snapshot of the totals.
+        Without a results file the snapshot is empty, and a snapshot follows once the file has games.
+        """
+        subscriber = queue.Queue(maxsize=1000)
+        try:
+            body, _ = self.update()
+        except FileNotFoundError:
+            with self.lock:
+                self.reset(None)
+                body = self.body = json.dumps(self.to_dict())
+        with self.lock:
+            subscriber.put_nowait(f"event: snapshot\ndata: {body}\n\n")
+            self.subscribers.add(subscriber)
+        results_watcher.ensure_running()
+        return subscriber
 
-                if word_added.lower() == 'yes':
-                    total_new_words_added += 1
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
 
+    def to_dict(self):
         # Calculate statistics
-        win_percentage = (total_wins / total_games) * 100 if total_games > 0 else 0
-        avg_time_per_turn = (total_time / total_turns) if total_turns > 0 else 0
-        total_errors = sum(v['errors'] for v in error_counts_per_word_length.values())
-        avg_errors = (total_errors / total_games) if total_games > 0 else 0
+        win_percentage = (self.total_wins / self.total_games) * 100 if self.total_games > 0 else 0
+        avg_time_per_turn = (self.total_time / self.total_turns) if self.total_turns > 0 else 0
+        total_errors = sum(v['errors'] for v in self.error_counts_per_word_length.values())
+        avg_errors = (total_errors / self.total_games) if self.total_games > 0 else 0
 
         # Convert keys of error_counts_per_word_length to strings for JSON compatibility
-        error_counts_per_word_length_str_keys = {str(k): v for k, v in error_counts_per_word_length.items()}
+        error_counts_per_word_length_str_keys = {str(k): v for k, v in self.error_counts_per_word_length.items()}
 
-        response = {
-            'total_games': total_games,
-            'total_wins': total_wins,
+        return {
+            'total_games': self.total_games,
+            'total_wins': self.total_wins,
             'win_percentage': win_percentage,
             'avg_time_per_turn': avg_time_per_turn,
             'avg_errors': avg_errors,
-            'total_new_words_added': total_new_words_added,
+            'total_new_words_added': self.total_new_words_added,
             'error_counts_per_word_length': error_counts_per_word_length_str_keys
         }
 
-        return jsonify(response), 200
+class ResultsWatcher:
+    """
+    A single thread that checks RESULTS_FILE for new games while dashboards are streaming,
+    so the cost of the check does not grow with the number of open dashboards.
+    """
+    def __init__(self, aggregate):
+        self.aggregate = aggregate
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def ensure_running(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='results-watcher', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while self.aggregate.subscribers:
+            time.sleep(STREAM_POLL_INTERVAL)
+            try:
+                self.aggregate.update()
+            except FileNotFoundError:
+                pass  # No games yet, the streams started with an empty snapshot
+            except Exception as e:
+                print(f'Error reading results file: {e}')
 
+results_aggregate = ResultsAggregate(RESULTS_FILE)
+results_watcher = ResultsWatcher(results_aggregate)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    try:
+        body, etag = results_aggregate.update()
     except FileNotFoundError:
         return jsonify({'error': 'Results file not found'}), 500
     except Exception as e:
         print(f'Error reading results file: {e}')
         return jsonify({'error': 'Failed to read results file'}), 500
 
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+    return Response(body, status=200, mimetype='application/json', headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+@app.route('/api/stats/stream', methods=['GET'])
+def stream_stats():
+    """
+    Server-sent events with the stats: a 'snapshot' event with the same JSON as /api/stats on
+    connect, then a 'delta' event per batch of finished games with the new games, the updated
+    totals and only the word lengths they changed. Answers 200 without a results file as well,
+    as an EventSource does not reconnect after an error status.
+    """
+    subscriber = results_aggregate.subscribe()
+
+    def events():
+        try:
+            while True:
+                try:
+                    message = subscriber.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    message = ': keepalive\n\n'
+                if message is None:
+                    return
+                yield message
+        finally:
+            results_aggregate.unsubscribe(subscriber)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Read-only connection to the results database written by the bot, opened on first use
+results_store = None
+
+def get_results_store():
+    global results_store
+    if results_store is None:
+        if not os.path.exists(RESULTS_DB_FILE):
+            raise FileNotFoundError(RESULTS_DB_FILE)
+        results_store = ResultsStore(RESULTS_DB_FILE, readonly=True)
+    return results_store
+
+def query_results(query):
+    try:
+        return jsonify(query(get_results_store())), 200
+    except FileNotFoundError:
+        return jsonify({'error': 'Results database not found'}), 503
+    except Exception as e:
+        print(f'Error querying results database: {e}')
+        return jsonify({'error': 'Failed to query results database'}), 500
+
+@app.route('/api/stats/lengths', methods=['GET'])
+def get_length_stats():
+    return query_results(lambda store: {str(k): v for k, v in store.lengths().items()})
+
+@app.route('/api/stats/recent', methods=['GET'])
+def get_recent_stats():
+    hours = request.args.get('hours', 24, type=int)
+    return query_results(lambda store: dict(store.recent(hours), hours=hours, hourly=store.hourly(hours)))
+
+@app.route('/api/stats/players', methods=['GET'])
+def get_player_stats():
+    return query_results(lambda store: {str(k): v for k, v in store.by_players().items()})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Proxies the p50/p95/p99 phase latencies of the bot."""
+    try:
+        with urllib.request.urlopen(METRICS_URL, timeout=2) as response:
+            return jsonify(json.load(response)), 200
+    except Exception as e:
+        print(f'Error fetching bot metrics: {e}')
+        return jsonify({'error': 'Bot metrics unavailable'}), 502
+
 if __name__ == '__main__':
     # Run the Flask app on port 5000 by default
     app.run(host='0.0.0.0', port=5000, debug=True)
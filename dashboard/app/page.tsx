@@ -15,31 +15,42 @@ interface Stats {
   error_counts_per_word_length: Record<string, { errors: number; games: number }>
 }
 
-async function fetchStats(): Promise<Stats> {
-  const response = await fetch('http://127.0.0.1:5000/api/stats')
-  if (!response.ok) {
-    throw new Error('Failed to fetch stats')
-  }
-  return response.json()
+interface StatsDelta {
+  stats: Omit<Stats, 'error_counts_per_word_length'>
+  error_counts_per_word_length: Stats['error_counts_per_word_length']
+  games: { result: string; word_length: number; errors: number; total_time: number; turns: number; word_added: boolean }[]
 }
 
+// Sends a 'snapshot' event on connect and a 'delta' event with the changed word lengths as games finish
+const STATS_STREAM_URL = 'http://127.0.0.1:5000/api/stats/stream'
+
 export default function Page() {
   const [stats, setStats] = useState<Stats | null>(null)
 
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const data = await fetchStats()
-        setStats(data)
-      } catch (error) {
-        console.error('Error fetching stats:', error)
-      }
-    }
+    // EventSource reconnects by itself and the server answers every connect with a fresh snapshot
+    const source = new EventSource(STATS_STREAM_URL)
 
-    fetchData()
-    const interval = setInterval(fetchData, 5000)
+    source.addEventListener('snapshot', (event) => {
+      setStats(JSON.parse((event as MessageEvent).data))
+    })
+
+    source.addEventListener('delta', (event) => {
+      const delta: StatsDelta = JSON.parse((event as MessageEvent).data)
+      setStats((previous) => previous && {
+        ...delta.stats,
+        error_counts_per_word_length: {
+          ...previous.error_counts_per_word_length,
+          ...delta.error_counts_per_word_length
+        }
+      })
+    })
+
+    source.onerror = (error) => {
+      console.error('Error in stats stream:', error)
+    }
 
-    return () => clearInterval(interval)
+    return () => source.close()
   }, [])
 
   if (!stats) {